@@ -0,0 +1,312 @@
+"""
+Incrementally maintained dashboard aggregates and the hourly reservation rollup.
+
+The crud write paths call the apply_* helpers inside their own transaction, so
+the aggregates always commit together with the rows they describe. Rebuild from
+scratch and report drift with:
+
+    python -m backend.aggregates          # check only
+    python -m backend.aggregates --fix    # check and rewrite the aggregates
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, extract, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+TOTALS_ID = 1
+
+# Rollup columns grouped on for each trend granularity
+GRANULARITIES = {
+    "year": ("year",),
+    "month": ("year", "month"),
+    "day": ("year", "month", "day"),
+    "hour": ("year", "month", "day", "hour"),
+}
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+async def apply_user_delta(db: AsyncSession, users: int = 0, active: int = 0):
+    await db.execute(
+        update(models.DashboardTotals)
+        .where(models.DashboardTotals.id == TOTALS_ID)
+        .values(
+            total_users=models.DashboardTotals.total_users + users,
+            active_users=models.DashboardTotals.active_users + active,
+        )
+    )
+
+
+async def apply_reservation_delta(db: AsyncSession, court_id: Optional[int], start_date_time: datetime, count: int, revenue: int):
+    await apply_reservation_deltas(db, [(court_id, start_date_time, count, revenue)])
+
+
+async def apply_reservation_deltas(db: AsyncSession, deltas: Iterable[Tuple[Optional[int], datetime, int, int]]):
+    """
+    Apply (court_id, start_date_time, count, revenue) deltas with a fixed number
+    of statements: existing month and rollup rows are incremented with one
+    executemany each and missing ones are inserted together.
+    """
+    months: Dict[Tuple[int, int], List[int]] = {}
+    buckets: Dict[Tuple[Optional[int], datetime], List[int]] = {}
+    for court_id, start_date_time, count, revenue in deltas:
+        month = months.setdefault((start_date_time.year, start_date_time.month), [0, 0])
+        month[0] += count
+        month[1] += revenue
+        bucket = buckets.setdefault((court_id, hour_bucket(start_date_time)), [0, 0])
+        bucket[0] += count
+        bucket[1] += revenue
+    if not months:
+        return
+
+    await db.execute(
+        update(models.DashboardTotals)
+        .where(models.DashboardTotals.id == TOTALS_ID)
+        .values(
+            total_reservations=models.DashboardTotals.total_reservations + sum(c for c, _ in months.values()),
+            total_revenue=models.DashboardTotals.total_revenue + sum(r for _, r in months.values()),
+        )
+    )
+
+    month_table = models.DashboardMonth.__table__
+    existing_months = set((await db.execute(
+        select(month_table.c.year, month_table.c.month)
+        .where(tuple_(month_table.c.year, month_table.c.month).in_(list(months)))
+    )).tuples().all())
+    if existing_months:
+        await db.execute(
+            month_table.update()
+            .where(month_table.c.year == bindparam("b_year"), month_table.c.month == bindparam("b_month"))
+            .values(
+                reservations=month_table.c.reservations + bindparam("b_count"),
+                revenue=month_table.c.revenue + bindparam("b_revenue"),
+            ),
+            [
+                {"b_year": y, "b_month": m, "b_count": months[(y, m)][0], "b_revenue": months[(y, m)][1]}
+                for y, m in existing_months
+            ],
+        )
+    new_months = [
+        {"year": y, "month": m, "reservations": count, "revenue": revenue}
+        for (y, m), (count, revenue) in months.items() if (y, m) not in existing_months
+    ]
+    if new_months:
+        await db.execute(insert(models.DashboardMonth), new_months)
+
+    rollup_table = models.ReservationRollup.__table__
+    existing_buckets = {
+        (court_id, hour_start): rollup_id
+        for rollup_id, court_id, hour_start in (await db.execute(
+            select(rollup_table.c.id, rollup_table.c.court_id, rollup_table.c.hour_start)
+            .where(rollup_table.c.hour_start.in_({hour_start for _, hour_start in buckets}))
+        )).tuples()
+        if (court_id, hour_start) in buckets
+    }
+    if existing_buckets:
+        await db.execute(
+            rollup_table.update()
+            .where(rollup_table.c.id == bindparam("b_id"))
+            .values(
+                reservations=rollup_table.c.reservations + bindparam("b_count"),
+                revenue=rollup_table.c.revenue + bindparam("b_revenue"),
+            ),
+            [
+                {"b_id": rollup_id, "b_count": buckets[key][0], "b_revenue": buckets[key][1]}
+                for key, rollup_id in existing_buckets.items()
+            ],
+        )
+    new_buckets = [
+        rollup_row(court_id, hour_start, count, revenue)
+        for (court_id, hour_start), (count, revenue) in buckets.items()
+        if (court_id, hour_start) not in existing_buckets
+    ]
+    if new_buckets:
+        await db.execute(insert(models.ReservationRollup), new_buckets)
+
+
+def rollup_row(court_id: Optional[int], hour_start: datetime, count: int, revenue: int) -> dict:
+    return {
+        "hour_start": hour_start,
+        "court_id": court_id,
+        "year": hour_start.year,
+        "month": hour_start.month,
+        "day": hour_start.day,
+        "hour": hour_start.hour,
+        "reservations": count,
+        "revenue": revenue,
+    }
+
+
+async def get_trends(db: AsyncSession, start: datetime, end: datetime, granularity: str = "month", court_id: Optional[int] = None):
+    """Reservation count and revenue per period in [start, end), read from the rollup."""
+    columns = [getattr(models.ReservationRollup, name) for name in GRANULARITIES[granularity]]
+    query = (
+        select(*columns, func.sum(models.ReservationRollup.reservations), func.sum(models.ReservationRollup.revenue))
+        .filter(
+            models.ReservationRollup.hour_start >= hour_bucket(start),
+            models.ReservationRollup.hour_start < end.replace(tzinfo=None),
+        )
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    if court_id is not None:
+        query = query.filter(models.ReservationRollup.court_id == court_id)
+    result = await db.execute(query)
+    return [
+        dict(zip(GRANULARITIES[granularity], row[:-2]), reservations=row[-2], revenue=row[-1])
+        for row in result.all()
+        if row[-2]
+    ]
+
+
+async def get_summary(db: AsyncSession):
+    """Return (totals row, list of month rows); totals is None before the first rebuild."""
+    totals = await db.get(models.DashboardTotals, TOTALS_ID)
+    result = await db.execute(
+        select(models.DashboardMonth).order_by(models.DashboardMonth.year, models.DashboardMonth.month)
+    )
+    return totals, result.scalars().all()
+
+
+async def compute_from_scratch(db: AsyncSession):
+    """Aggregate the users and reservations tables directly."""
+    total_users = await db.scalar(select(func.count(models.User.id)))
+    active_users = await db.scalar(select(func.count(models.User.id)).filter(models.User.is_active == True))
+    total_reservations, total_revenue = (await db.execute(
+        select(func.count(models.Reservation.id), func.coalesce(func.sum(models.Reservation.rate), 0))
+    )).one()
+    year = extract('year', models.Reservation.start_date_time)
+    month = extract('month', models.Reservation.start_date_time)
+    months = (await db.execute(
+        select(year, month, func.count(models.Reservation.id), func.coalesce(func.sum(models.Reservation.rate), 0))
+        .filter(models.Reservation.start_date_time != None)
+        .group_by(year, month)
+    )).all()
+    hour = extract('hour', models.Reservation.start_date_time)
+    day = extract('day', models.Reservation.start_date_time)
+    rollups = (await db.execute(
+        select(models.Reservation.court_id, year, month, day, hour,
+               func.count(models.Reservation.id), func.coalesce(func.sum(models.Reservation.rate), 0))
+        .filter(models.Reservation.start_date_time != None)
+        .group_by(models.Reservation.court_id, year, month, day, hour)
+    )).all()
+    totals = {
+        "total_users": total_users,
+        "active_users": active_users,
+        "total_reservations": total_reservations,
+        "total_revenue": total_revenue,
+    }
+    return (
+        totals,
+        {(int(y), int(m)): (count, revenue) for y, m, count, revenue in months},
+        {
+            (court_id, datetime(int(y), int(m), int(d), int(h))): (count, revenue)
+            for court_id, y, m, d, h, count, revenue in rollups
+        },
+    )
+
+
+async def reconcile(db: AsyncSession, fix: bool = False):
+    """
+    Compare the stored aggregates with a fresh computation and return the
+    differences as a list of strings. With fix=True the stored aggregates are
+    replaced by the fresh values.
+    """
+    expected_totals, expected_months, expected_rollups = await compute_from_scratch(db)
+    totals, months = await get_summary(db)
+    rollup_table = models.ReservationRollup.__table__
+    stored_rollups = {
+        (court_id, hour_start): (count, revenue)
+        for court_id, hour_start, count, revenue in (await db.execute(select(
+            rollup_table.c.court_id, rollup_table.c.hour_start, rollup_table.c.reservations, rollup_table.c.revenue
+        ))).tuples()
+    }
+
+    drift = []
+    if totals is None:
+        drift.append("dashboard totals are missing")
+    else:
+        for key, value in expected_totals.items():
+            if getattr(totals, key) != value:
+                drift.append(f"{key}: stored {getattr(totals, key)}, actual {value}")
+    stored_months = {(row.year, row.month): (row.reservations, row.revenue) for row in months}
+    for key in sorted(set(stored_months) | set(expected_months)):
+        stored = stored_months.get(key, (0, 0))
+        actual = expected_months.get(key, (0, 0))
+        if stored != actual:
+            drift.append(f"{key[0]}-{key[1]:02d}: stored {stored}, actual {actual}")
+    for key in set(stored_rollups) | set(expected_rollups):
+        stored = stored_rollups.get(key, (0, 0))
+        actual = expected_rollups.get(key, (0, 0))
+        if stored != actual:
+            drift.append(f"court {key[0]} {key[1]:%Y-%m-%d %H}h: stored {stored}, actual {actual}")
+
+    if fix and drift:
+        await db.execute(delete(models.DashboardMonth))
+        await db.execute(delete(models.ReservationRollup))
+        if totals is None:
+            db.add(models.DashboardTotals(id=TOTALS_ID, **expected_totals))
+        else:
+            for key, value in expected_totals.items():
+                setattr(totals, key, value)
+        await db.flush()
+        if expected_months:
+            await db.execute(insert(models.DashboardMonth), [
+                {"year": y, "month": m, "reservations": count, "revenue": revenue}
+                for (y, m), (count, revenue) in expected_months.items()
+            ])
+        if expected_rollups:
+            await db.execute(insert(models.ReservationRollup), [
+                rollup_row(court_id, hour_start, count, revenue)
+                for (court_id, hour_start), (count, revenue) in expected_rollups.items()
+            ])
+        await db.commit()
+    return drift
+
+
+async def ensure_initialized(db: AsyncSession):
+    """Build the aggregates on first start, e.g. for a database created before they existed."""
+    totals = await db.get(models.DashboardTotals, TOTALS_ID)
+    rollup_missing = totals is not None and totals.total_reservations and not await db.scalar(
+        select(models.ReservationRollup.id).limit(1)
+    )
+    if totals is None or rollup_missing:
+        await reconcile(db, fix=True)
+
+
+async def run_reconcile(fix: bool):
+    from .database import AsyncSessionLocal, Base, async_engine, engine
+
+    Base.metadata.create_all(bind=engine)
+    try:
+        async with AsyncSessionLocal() as db:
+            return await reconcile(db, fix=fix)
+    finally:
+        # Pooled aiosqlite connections run on non-daemon threads that would keep the CLI alive
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the dashboard aggregates for drift.")
+    parser.add_argument("--fix", action="store_true", help="rewrite the aggregates from the raw tables")
+    args = parser.parse_args()
+
+    drift = asyncio.run(run_reconcile(args.fix))
+    if not drift:
+        print("Dashboard aggregates are in sync")
+        return
+    for line in drift:
+        print(line)
+    print(f"{len(drift)} difference(s) {'fixed' if args.fix else 'found'}")
+    raise SystemExit(0 if args.fix else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from . import models
+from .occupancy import Booking
+
+SLOT = timedelta(hours=1)
+
+
+def hour_floor(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def hour_ceil(value: datetime) -> datetime:
+    floored = hour_floor(value)
+    return floored if floored == value.replace(tzinfo=None) else floored + SLOT
+
+
+def occupancy_matrix(courts: Sequence[models.Court], bookings: Dict[int, List[Booking]], start: datetime, slots: int):
+    """Boolean court x hour matrix, True where any booking touches the hour slot."""
+    busy = np.zeros((len(courts), slots), dtype=bool)
+    for row, court in enumerate(courts):
+        for booking in bookings.get(court.id, ()):
+            first = max(0, int((booking.start_date_time - start) // SLOT))
+            last = min(slots, int(-(-(booking.end_date_time - start) // SLOT)))
+            busy[row, first:last] = True
+    return busy
+
+
+def find_free_windows(
+    courts: Sequence[models.Court],
+    bookings: Dict[int, List[Booking]],
+    start: datetime,
+    end: datetime,
+    duration: int,
+    limit: int,
+):
+    """
+    Every hour-aligned window of `duration` hours in [start, end) that is free on a
+    court, sorted by start time and then price.
+    """
+    start, end = hour_ceil(start), hour_floor(end)
+    slots = int((end - start) // SLOT)
+    if not courts or slots < duration:
+        return []
+
+    busy = occupancy_matrix(courts, bookings, start, slots)
+    # Busy slots inside each window, from a running total along the hour axis
+    cumulative = np.zeros((len(courts), slots + 1), dtype=np.int32)
+    np.cumsum(busy, axis=1, out=cumulative[:, 1:])
+    free = (cumulative[:, duration:] - cumulative[:, :-duration]) == 0
+
+    court_rows, start_slots = np.nonzero(free)
+    prices = np.array([float(court.hourly_rate) * duration for court in courts])
+    order = np.lexsort((prices[court_rows], start_slots))[:limit]
+    return [
+        {
+            "court_id": courts[court_rows[i]].id,
+            "court_name": courts[court_rows[i]].court_name,
+            "court_type": courts[court_rows[i]].court_type,
+            "start_date_time": start + int(start_slots[i]) * SLOT,
+            "end_date_time": start + (int(start_slots[i]) + duration) * SLOT,
+            "price": prices[court_rows[i]],
+        }
+        for i in order
+    ]
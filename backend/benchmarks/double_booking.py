@@ -0,0 +1,143 @@
+"""
+Concurrency stress check for double booking.
+
+Fires many simultaneous bookings of the same court and hour, each from a
+different customer, and checks that exactly one is accepted, that every other
+one gets 409, and that the database holds a single reservation and slot:
+
+    python -m backend.benchmarks.double_booking
+    python -m backend.benchmarks.double_booking --requests 500 --rounds 5
+
+Each round first goes through POST /api/create_reservation/, then calls
+crud.create_user_reservation directly from separate sessions, skipping the
+in-memory conflict check so only the reservation_slots constraint is left to
+stop the duplicates. Exits 1 if any round lets through more or less than one.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+PASSWORD = "Stress1!pass"
+FIRST_SLOT = datetime(2030, 1, 1, 18)
+
+
+def seed(customers: int):
+    from backend import crud, models
+    from backend.database import engine
+
+    hashed_password = crud.hash_password(PASSWORD)
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), [
+            dict(username=f"customer{i}", email=f"customer{i}@example.com", phonenumber=f"98{i:08d}",
+                 avatar_url="", hashed_password=hashed_password, role=models.RoleEnum.CUSTOMER, is_active=True)
+            for i in range(customers)
+        ])
+        connection.execute(insert(models.Court), [
+            dict(court_name="Court 1", court_type="futsal", description="", capacity=10, hourly_rate=1000, is_available=True)
+        ])
+
+
+async def count_slot(db, start: datetime):
+    from backend import models
+    from backend.occupancy import slot_indexes
+
+    reservations = await db.scalar(select(func.count()).select_from(models.Reservation).filter(
+        models.Reservation.court_id == 1, models.Reservation.start_date_time == start
+    ))
+    slots = await db.scalar(select(func.count()).select_from(models.ReservationSlot).filter(
+        models.ReservationSlot.court_id == 1,
+        models.ReservationSlot.slot_index.in_(list(slot_indexes(start, start + timedelta(hours=1)))),
+    ))
+    return reservations, slots
+
+
+async def through_api(client, tokens, start: datetime) -> Counter:
+    body = {"court_id": 1, "start_date_time": start.isoformat(), "end_date_time": (start + timedelta(hours=1)).isoformat()}
+
+    async def book(token):
+        response = await client.post("/api/create_reservation/", json=body, cookies={"token": token})
+        return response.status_code
+
+    return Counter(await asyncio.gather(*(book(token) for token in tokens)))
+
+
+async def through_crud(user_ids, start: datetime) -> Counter:
+    from backend import crud, schemas
+    from backend.database import AsyncSessionLocal
+
+    reservation = schemas.ReservationCreate(court_id=1, start_date_time=start, end_date_time=start + timedelta(hours=1))
+
+    async def book(user_id):
+        async with AsyncSessionLocal() as db:
+            try:
+                await crud.create_user_reservation(db, reservation, user_id)
+                return "created"
+            except crud.SlotTaken:
+                return "slot taken"
+            except Exception as error:
+                return type(error).__name__
+
+    return Counter(await asyncio.gather(*(book(user_id) for user_id in user_ids)))
+
+
+async def run(args) -> bool:
+    import httpx
+
+    from backend import main
+    from backend.database import AsyncSessionLocal, async_engine
+
+    user_ids = list(range(1, args.requests + 1))
+    tokens = [main.create_access_token({"sub": str(user_id)}) for user_id in user_ids]
+    passed = True
+    try:
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+                for round_number in range(args.rounds):
+                    for mode, start in (("api", FIRST_SLOT + timedelta(days=2 * round_number)),
+                                        ("crud", FIRST_SLOT + timedelta(days=2 * round_number + 1))):
+                        started = time.perf_counter()
+                        if mode == "api":
+                            outcomes = await through_api(client, tokens, start)
+                            winners, expected_losers = outcomes.get(200, 0), {409}
+                        else:
+                            outcomes = await through_crud(user_ids, start)
+                            winners, expected_losers = outcomes.get("created", 0), {"slot taken"}
+                        elapsed = time.perf_counter() - started
+                        async with AsyncSessionLocal() as db:
+                            reservations, slots = await count_slot(db, start)
+                        ok = (winners == 1 and reservations == 1 and slots == 1
+                              and set(outcomes) - {200, "created"} <= expected_losers)
+                        passed &= ok
+                        print(f"round {round_number + 1} {mode:<4} {dict(outcomes)} -> {reservations} reservation(s), "
+                              f"{slots} slot(s) in {elapsed:.2f}s  {'ok' if ok else 'FAILED'}", flush=True)
+    finally:
+        # Pooled aiosqlite connections keep non-daemon threads alive otherwise
+        await async_engine.dispose()
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="simultaneous bookings of each slot")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    # The app binds its engines to ./sql_app.db on import, so run it in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="futsala-stress-"))
+    os.environ["DATABASE_URL"] = "sqlite:///./sql_app.db"
+    import backend.main  # noqa: F401  creates the schema
+
+    seed(args.requests)
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Response format benchmark.
+
+Encodes the /api/all-reserves/ and /api/users/ bodies with each serializer
+and compresses each result with each content coding, reporting the bytes on
+the wire and the CPU time per response for encoding and for compression:
+
+    python -m backend.benchmarks.formats
+    python -m backend.benchmarks.formats --rows 1000 --users 20000 --repeat 50
+
+`jsonable+json` is FastAPI's default path for plain data (jsonable_encoder then
+stdlib json), `adapter` is rows_response's precompiled adapter, `orjson` renders
+the adapter's Python output with orjson like DEFAULT_RESPONSE_CLASS does, and
+`msgpack` is what rows_response sends for Accept: application/msgpack. orjson,
+msgpack and brotli come with requirements.txt and the benchmark refuses to run
+without them.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import crud, responses, schemas
+from backend.benchmarks.read_models import seed
+from backend.database import make_async_engine
+
+
+def stdlib_json(adapter, rows) -> bytes:
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+ENCODERS = {
+    "jsonable+json": stdlib_json,
+    "adapter": responses.encode,
+    "orjson": lambda adapter, rows: responses.orjson.dumps(adapter.dump_python(rows, mode="json")),
+    "msgpack": lambda adapter, rows: responses.encode(adapter, rows, responses.MSGPACK),
+}
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def cpu_per_call(function, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - started) / repeat
+
+
+async def load(rows: int, users: int, courts: int):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='futsala-bench-'), 'bench.db')}"
+    seed(url, rows, courts, users)
+    engine = make_async_engine(url)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as db:
+        reservations, _ = await crud.get_reserve_rows_page(db, limit=rows)
+        user_rows = await crud.get_user_rows(db)
+    await engine.dispose()
+    return {
+        "all-reserves": (schemas.reservation_rows_adapter, reservations),
+        "users": (schemas.user_rows_adapter, user_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="reservations per page (the endpoint allows 1000)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--courts", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20, help="encodings timed per measurement")
+    args = parser.parse_args()
+    missing = [name for name in ("orjson", "msgpack", "brotli") if getattr(responses, name) is None]
+    if missing:
+        parser.error(f"{', '.join(missing)} not installed; pip install -r requirements.txt")
+
+    bodies = asyncio.run(load(args.rows, args.users, args.courts))
+    print(f"{'endpoint':<13} {'rows':>6}  {'format':<14} {'encoding':<8} {'bytes':>10} {'encode ms':>10} {'compress ms':>12}")
+    for endpoint, (adapter, rows) in bodies.items():
+        for name, encoder in ENCODERS.items():
+            body = encoder(adapter, rows)
+            encode_cpu = cpu_per_call(lambda: encoder(adapter, rows), args.repeat)
+            for encoding in ENCODINGS:
+                if encoding == "identity":
+                    size, compress_cpu = len(body), 0.0
+                else:
+                    size = len(responses.compress(body, encoding))
+                    compress_cpu = cpu_per_call(lambda: responses.compress(body, encoding), args.repeat)
+                print(f"{endpoint:<13} {len(rows):>6}  {name:<14} {encoding:<8} {size:>10} "
+                      f"{encode_cpu * 1000:>10.2f} {compress_cpu * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
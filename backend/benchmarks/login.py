@@ -0,0 +1,105 @@
+"""
+Login throughput benchmark.
+
+Fires concurrent logins at the app while timing event loop stalls, once with
+password hashing run inline on the event loop and once on the hashing pool.
+
+    python -m backend.benchmarks.login --logins 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# The app opens ./sql_app.db on import, so run it in a scratch directory
+os.chdir(tempfile.mkdtemp(prefix="futsala-bench-"))
+
+import httpx
+
+from backend import crud, models
+from backend.database import SessionLocal
+from backend.hashing import HashingPool, HASH_POOL_SIZE, HASH_QUEUE_LIMIT
+from backend.main import app
+
+PASSWORD = "Bench1!pass"
+
+
+def seed_users(count: int):
+    hashed_password = crud.hash_password(PASSWORD)
+    db = SessionLocal()
+    db.add_all([
+        models.User(
+            username=f"bench{i}",
+            email=f"bench{i}@example.com",
+            phonenumber="9800000000",
+            avatar_url="",
+            hashed_password=hashed_password,
+        )
+        for i in range(count)
+    ])
+    db.commit()
+    db.close()
+
+
+async def run(pool: HashingPool, logins: int, concurrency: int, users: int):
+    crud.hashing_pool = pool
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        loop_lags = []
+        done = asyncio.Event()
+
+        async def login(i: int):
+            async with semaphore:
+                response = await client.post("/api/login/", json={
+                    "email": f"bench{i % users}@example.com",
+                    "password": PASSWORD,
+                })
+                response.raise_for_status()
+
+        async def watch_loop():
+            # Oversleeping a short timer shows how long the event loop was blocked
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                loop_lags.append(time.perf_counter() - started - 0.005)
+
+        watcher = asyncio.create_task(watch_loop())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await watcher
+
+    loop_lags.sort()
+    return {
+        "logins_per_second": logins / elapsed,
+        "lag_p50_ms": loop_lags[len(loop_lags) // 2] * 1000,
+        "lag_max_ms": loop_lags[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    seed_users(args.users)
+    profiles = [
+        ("inline", HashingPool(0, 0)),
+        (f"pool({HASH_POOL_SIZE})", HashingPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)),
+    ]
+    for name, pool in profiles:
+        result = asyncio.run(run(pool, args.logins, args.concurrency, args.users))
+        pool.shutdown()
+        print(
+            f"{name:<10} {result['logins_per_second']:8.1f} logins/s   "
+            f"loop lag p50 {result['lag_p50_ms']:7.1f} ms   max {result['lag_max_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+List endpoint serialization benchmark.
+
+Renders the /api/all-reserves/ page body for N reservations twice: through ORM
+objects validated into schemas.ReservationWithCourt, and through the column
+read model serialized by schemas.reservation_rows_adapter. Reports CPU time per
+row and peak traced memory for each path.
+
+    python -m backend.benchmarks.read_models --rows 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import crud, models, schemas
+from backend.database import Base, make_async_engine, make_engine
+
+orm_adapter = TypeAdapter(list[schemas.ReservationWithCourt])
+
+
+def seed(url: str, rows: int, courts: int, users: int):
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    base = datetime(2030, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), [
+            dict(username=f"user{i}", email=f"user{i}@example.com", phonenumber="9800000000",
+                 avatar_url="", hashed_password="", role=models.RoleEnum.CUSTOMER)
+            for i in range(users)
+        ])
+        connection.execute(insert(models.Court), [
+            dict(court_name=f"Court {i}", court_type="indoor", description="", capacity=10, hourly_rate=1000)
+            for i in range(courts)
+        ])
+        connection.execute(insert(models.Reservation), [
+            dict(start_date_time=base + timedelta(hours=i), end_date_time=base + timedelta(hours=i + 1),
+                 rate=1000, court_id=i % courts + 1, reservor_id=i % users + 1)
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+async def render_orm(db, rows: int) -> bytes:
+    reservations, _ = await crud.get_reserves_page(db, limit=rows)
+    return orm_adapter.dump_json(orm_adapter.validate_python(reservations, from_attributes=True))
+
+
+async def render_rows(db, rows: int) -> bytes:
+    page, _ = await crud.get_reserve_rows_page(db, limit=rows)
+    return schemas.reservation_rows_adapter.dump_json(page)
+
+
+async def measure(Session, render, rows: int):
+    async with Session() as db:
+        await render(db, 10)  # warm up statement caches and the connection
+    async with Session() as db:
+        tracemalloc.start()
+        started = time.process_time()
+        body = await render(db, rows)
+        cpu = time.process_time() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return cpu, peak, len(body)
+
+
+async def run(rows: int, courts: int, users: int):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='futsala-bench-'), 'bench.db')}"
+    seed(url, rows, courts, users)
+    engine = make_async_engine(url)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    results = {}
+    for name, render in [("orm", render_orm), ("rows", render_rows)]:
+        results[name] = await measure(Session, render, rows)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--courts", type=int, default=8)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        results = asyncio.run(run(rows, args.courts, args.users))
+        for name, (cpu, peak, size) in results.items():
+            print(
+                f"{rows:>7} rows  {name:<5} {cpu * 1e6 / rows:7.1f} us/row CPU  "
+                f"{peak / 2**20:8.1f} MiB peak  {size / 2**20:6.1f} MiB body"
+            )
+
+
+if __name__ == "__main__":
+    main()
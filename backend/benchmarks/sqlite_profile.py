@@ -0,0 +1,107 @@
+"""
+SQLite engine profile benchmark.
+
+Runs reader and writer threads against a scratch database, once with SQLite's
+default settings and once with the tuned PRAGMA profile from backend.database,
+and reports throughput and "database is locked" errors.
+
+    python -m backend.benchmarks.sqlite_profile --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+from backend.database import Base, describe_engine, make_engine
+
+
+def run_profile(tuned: bool, readers: int, writers: int, seconds: float, courts: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="futsala-bench-"), "bench.db")
+    engine = make_engine(f"sqlite:///{path}", tuned=tuned)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([
+            models.Court(court_name=f"Court {i}", court_type="indoor", description="", capacity=10, hourly_rate=1000)
+            for i in range(courts)
+        ])
+        db.commit()
+
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+    base = datetime(2030, 1, 1)
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            day = base + timedelta(days=rng.randrange(365))
+            try:
+                with Session() as db:
+                    db.execute(select(func.count(models.Reservation.id)).filter(
+                        models.Reservation.court_id == rng.randrange(1, courts + 1),
+                        models.Reservation.start_date_time >= day,
+                        models.Reservation.start_date_time < day + timedelta(days=1),
+                    )).scalar()
+                count("reads")
+            except OperationalError:
+                count("locked")
+
+    def writer():
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            start = base + timedelta(hours=rng.randrange(365 * 24))
+            try:
+                with Session() as db:
+                    db.add(models.Reservation(
+                        start_date_time=start, end_date_time=start + timedelta(hours=1),
+                        court_id=rng.randrange(1, courts + 1), reservor_id=1,
+                    ))
+                    db.commit()
+                count("writes")
+            except OperationalError:
+                count("locked")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    settings = describe_engine(engine)
+    engine.dispose()
+    return settings, {key: value / seconds if key != "locked" else value for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--courts", type=int, default=4)
+    args = parser.parse_args()
+
+    for name, tuned in [("default", False), ("tuned", True)]:
+        settings, result = run_profile(tuned, args.readers, args.writers, args.seconds, args.courts)
+        print(
+            f"{name:<8} {result['reads']:9.1f} reads/s {result['writes']:8.1f} writes/s "
+            f"{result['locked']:5d} locked errors   "
+            f"(journal_mode={settings['journal_mode']}, synchronous={settings['synchronous']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
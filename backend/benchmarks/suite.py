@@ -0,0 +1,281 @@
+"""
+End-to-end API benchmark suite.
+
+Seeds a deterministic dataset (users, courts, several years of hourly
+reservations, tasks) into a scratch SQLite database, then drives the key
+backend.main endpoints through an in-process ASGI client and reports latency
+percentiles, throughput and SQL statements per request for each scenario.
+
+    python -m backend.benchmarks.suite                            # run and print
+    python -m backend.benchmarks.suite --save baseline.json       # record a baseline
+    python -m backend.benchmarks.suite --compare baseline.json    # exit 1 on regressions
+
+The same --seed and dataset sizes always produce the same data and requests,
+so runs are comparable; compare on the same machine the baseline was made on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+PASSWORD = "Bench1!pass"
+MANAGER_EMAIL = "manager@example.com"
+COURT_TYPES = ("indoor", "outdoor", "futsal")
+FIRST_DAY = datetime(2023, 1, 1)
+OPEN_HOURS = range(6, 22)
+
+
+def seed(rng: random.Random, users: int, courts: int, years: int, occupancy: float, tasks: int):
+    """Insert the dataset with executemany batches and return its size."""
+    from backend import crud, models
+    from backend.database import engine
+
+    hashed_password = crud.hash_password(PASSWORD)
+    user_rows = [
+        dict(username="manager", email=MANAGER_EMAIL, phonenumber="9800000000", avatar_url="",
+             hashed_password=hashed_password, role=models.RoleEnum.MANAGER, is_active=True)
+    ]
+    for i in range(1, users):
+        role = models.RoleEnum.EMPLOYEE if i % 50 == 0 else models.RoleEnum.CUSTOMER
+        user_rows.append(dict(
+            username=f"user{i}", email=f"user{i}@example.com", phonenumber=f"98{i:08d}", avatar_url="",
+            hashed_password=hashed_password, role=role, is_active=rng.random() > 0.05,
+        ))
+    employees = [i + 1 for i, row in enumerate(user_rows) if row["role"] == models.RoleEnum.EMPLOYEE]
+
+    court_rows = [
+        dict(court_name=f"Court {i + 1}", court_type=COURT_TYPES[i % len(COURT_TYPES)], description="",
+             capacity=rng.choice((10, 12, 14)), hourly_rate=rng.choice((1000, 1200, 1500, 2000)), is_available=True)
+        for i in range(courts)
+    ]
+
+    reservation_rows = []
+    for day in range(365 * years):
+        date = FIRST_DAY + timedelta(days=day)
+        for court_id in range(1, courts + 1):
+            for hour in OPEN_HOURS:
+                if rng.random() < occupancy:
+                    start = date.replace(hour=hour)
+                    reservation_rows.append(dict(
+                        start_date_time=start, end_date_time=start + timedelta(hours=1),
+                        rate=court_rows[court_id - 1]["hourly_rate"], court_id=court_id,
+                        reservor_id=rng.randrange(2, users + 1), status="Pending",
+                    ))
+
+    task_rows = [
+        dict(title=f"Task {i}", description="", due_date=FIRST_DAY + timedelta(days=rng.randrange(365 * years)),
+             status=rng.choice(list(models.TaskStatus)), assigned_to=rng.choice(employees) if employees else None)
+        for i in range(tasks)
+    ]
+
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), user_rows)
+        connection.execute(insert(models.Court), court_rows)
+        for offset in range(0, len(reservation_rows), 10000):
+            connection.execute(insert(models.Reservation), reservation_rows[offset:offset + 10000])
+        if task_rows:
+            connection.execute(insert(models.Task), task_rows)
+    return {"users": len(user_rows), "courts": courts, "reservations": len(reservation_rows), "tasks": len(task_rows)}
+
+
+def scenarios(rng: random.Random, courts: int, years: int):
+    """(name, requests, factory) where factory(i) returns (method, url, params, json)."""
+    last_day = FIRST_DAY + timedelta(days=365 * years - 1)
+
+    def some_day():
+        return FIRST_DAY + timedelta(days=rng.randrange(365 * years))
+
+    def court():
+        return rng.randrange(1, courts + 1)
+
+    def free_slot(i):
+        # Past the seeded range, one new hour per request, so every booking succeeds
+        start = last_day + timedelta(days=1 + i // (courts * len(OPEN_HOURS)), hours=OPEN_HOURS[0] + i % len(OPEN_HOURS))
+        court_id = i // len(OPEN_HOURS) % courts + 1
+        return {"court_id": court_id, "start_date_time": start.isoformat(),
+                "end_date_time": (start + timedelta(hours=1)).isoformat()}
+
+    def search(i):
+        day = some_day()
+        return "GET", "/api/availability/search", {"from": day.isoformat(), "to": (day + timedelta(days=7)).isoformat(), "duration": 2}, None
+
+    def page(i):
+        day = some_day()
+        return "GET", "/api/all-reserves/", {"limit": 100, "court_id": court(), "start": day.isoformat()}, None
+
+    return [
+        ("courts", 300, lambda i: ("GET", "/api/courts/", None, None)),
+        ("court_detail", 300, lambda i: ("GET", f"/api/courts/{court()}", None, None)),
+        ("reserves_by_day", 300, lambda i: ("GET", f"/api/reserves_by_day/{court()}", {"date_time": some_day().isoformat()}, None)),
+        # Everyone watching the same court-day, where identical requests overlap
+        ("reserves_by_day_hot", 300, lambda i: ("GET", "/api/reserves_by_day/1", {"date_time": last_day.isoformat()}, None)),
+        ("availability_search", 200, search),
+        ("all_reserves_page", 200, page),
+        ("users", 30, lambda i: ("GET", "/api/users/", None, None)),
+        ("tasks", 100, lambda i: ("GET", "/api/tasks/all", None, None)),
+        ("dashboard", 200, lambda i: ("GET", "/api/dashboard", None, None)),
+        ("reservation_trends", 200, lambda i: ("GET", "/api/reservation_trends", {
+            "start": FIRST_DAY.isoformat(), "end": last_day.isoformat(), "granularity": "day"}, None)),
+        ("create_reservation", 200, lambda i: ("POST", "/api/create_reservation/", None, free_slot(i))),
+        ("login", 20, lambda i: ("POST", "/api/login/", None, {"email": MANAGER_EMAIL, "password": PASSWORD})),
+    ]
+
+
+def percentile(values, fraction: float) -> float:
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def run_scenario(client, registry, name, count, factory, concurrency: int, warmup: int):
+    for i in range(warmup):
+        method, url, params, body = factory(count + i)
+        await client.request(method, url, params=params, json=body)
+    registry.reset()
+
+    requests = [factory(i) for i in range(count)]
+    latencies = []
+    errors = 0
+    queue = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for method, url, params, body in queue:
+            started = time.perf_counter()
+            response = await client.request(method, url, params=params, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    statements = sum(stats.statements for stats in registry.routes.values())
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(count / elapsed, 1),
+        "queries_per_request": round(statements / count, 2),
+    }
+
+
+async def run_suite(args, rng: random.Random):
+    import httpx
+
+    from backend import metrics
+    from backend.database import async_engine
+    from backend.main import app, lifespan
+
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/login/", json={"email": MANAGER_EMAIL, "password": PASSWORD})
+            response.raise_for_status()
+            client.cookies.set("token", response.cookies["token"])
+            for name, count, factory in scenarios(rng, args.courts, args.years):
+                if args.only and name not in args.only:
+                    continue
+                count = max(1, int(count * args.scale))
+                results[name] = await run_scenario(
+                    client, metrics.registry, name, count, factory, args.concurrency, args.warmup
+                )
+                print(format_result(name, results[name]), flush=True)
+    # Pooled aiosqlite connections keep non-daemon threads alive otherwise
+    await async_engine.dispose()
+    return results
+
+
+def format_result(name: str, result: dict) -> str:
+    return (
+        f"{name:<20} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+        f"{result['throughput_rps']:8.1f} req/s  {result['queries_per_request']:6.2f} q/req"
+        + (f"  {result['errors']} errors" if result["errors"] else "")
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Return regressions of `current` against `baseline` as strings."""
+    regressions = []
+    if baseline.get("dataset") != current.get("dataset"):
+        regressions.append(f"dataset differs from the baseline: {baseline.get('dataset')} vs {current.get('dataset')}")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if result[key] > before[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {before[key]:.2f} -> {result[key]:.2f} (+{result[key] / before[key] - 1:.0%})")
+        if result["throughput_rps"] < before["throughput_rps"] / (1 + threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s")
+        if result["queries_per_request"] > before["queries_per_request"]:
+            regressions.append(f"{name}: queries/request {before['queries_per_request']} -> {result['queries_per_request']}")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--courts", type=int, default=8)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--occupancy", type=float, default=0.4, help="share of open hours that are booked")
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the request count of every scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run only these scenarios")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, 0.2 = 20%%")
+    args = parser.parse_args()
+    save = os.path.abspath(args.save) if args.save else None
+    baseline = json.load(open(args.compare)) if args.compare else None
+
+    # The app binds its engines to ./sql_app.db on import, so run it in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="futsala-bench-"))
+    os.environ["DATABASE_URL"] = "sqlite:///./sql_app.db"
+    os.environ["METRICS_ENABLED"] = "1"
+    os.environ.setdefault("PRINCIPAL_CACHE_TTL", "3600")
+    import backend.main  # noqa: F401  creates the schema
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    dataset = seed(rng, args.users, args.courts, args.years, args.occupancy, args.tasks)
+    print(f"Seeded {dataset} in {time.perf_counter() - started:.1f}s", flush=True)
+
+    results = {
+        "dataset": dict(dataset, seed=args.seed, years=args.years, occupancy=args.occupancy),
+        "settings": {"concurrency": args.concurrency, "scale": args.scale, "warmup": args.warmup},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "scenarios": asyncio.run(run_suite(args, rng)),
+    }
+
+    if save:
+        with open(save, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {save}")
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTLCache:
+    """
+    Small thread safe LRU cache whose entries also expire after `ttl` seconds
+    (or never, when ttl is None).
+    Keeps hit/miss counters so the cache can be watched from the debug endpoints.
+
+    `generation` is bumped by every invalidation. A caller loading a value reads
+    it before the load and passes it to `set`, which then drops the value if an
+    invalidation happened meanwhile, so a stale load cannot undo it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation: Optional[int] = None) -> bool:
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return False
+            expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return True
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,88 @@
+"""
+Request coalescing for hot read endpoints.
+
+Identical reads that arrive while one is already running wait for that one
+instead of querying again: the first caller starts the computation as a task
+and later callers with the same key await the same task. The result, usually
+a serialized response body, can also be kept for a short `ttl` (micro-cache).
+
+crud invalidates keys from its write paths after committing. An invalidated
+key is forgotten, in flight or cached, so reads starting after a write never
+share a result computed before it.
+
+Computations run in their own task, so a caller that disconnects does not
+cancel the read for the others waiting on it; they should open their own
+session for the same reason.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable
+
+from .cache import TTLCache
+
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL_MS", 250)) / 1000
+
+
+class SingleFlight:
+    def __init__(self, ttl: float = 0.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self.calls = 0
+        self.computed = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable]):
+        self.calls += 1
+        if self.results is not None:
+            # Cached results are stored boxed so None can be cached too
+            cached = self.results.get(key)
+            if cached is not None:
+                return cached[0]
+        task = self.inflight.get(key)
+        if task is None:
+            self.computed += 1
+            task = asyncio.ensure_future(compute())
+            self.inflight[key] = task
+            task.add_done_callback(lambda task: self.finished(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def finished(self, key: Hashable, task: asyncio.Task):
+        # An invalidation while the task ran already removed (or replaced) it
+        if self.inflight.get(key) is not task:
+            return
+        del self.inflight[key]
+        if not task.cancelled() and task.exception() is None and self.results is not None:
+            self.results.set(key, (task.result(),))
+
+    def invalidate(self, key: Hashable = None):
+        """Forget `key`, or every key when None."""
+        if key is None:
+            self.inflight.clear()
+            if self.results is not None:
+                self.results.clear()
+            return
+        self.inflight.pop(key, None)
+        if self.results is not None:
+            self.results.invalidate(key)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "cached": self.calls - self.computed - self.coalesced,
+            "in_flight": len(self.inflight),
+        }
+
+
+def day_key(court_id: int, day_start) -> tuple:
+    return (court_id, day_start)
+
+
+# Serialized /api/reserves_by_day bodies, keyed by court and day
+day_bookings_reads = SingleFlight(ttl=READ_CACHE_TTL)
+# Court catalog misses; court_catalog itself caches the bodies until courts change or expire
+court_catalog_reads = SingleFlight()
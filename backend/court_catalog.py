@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from .cache import TTLCache
+
+# Serialized court catalog response together with its validators
+CatalogEntry = namedtuple("CatalogEntry", ["version", "body", "etag", "last_modified"])
+
+
+class CourtCatalogCache:
+    """
+    Serialized responses of the court catalog endpoints, tagged with a catalog
+    version. crud bumps the version whenever courts change, which retires every
+    cached body at once. Writes made by other processes are not seen, so bodies
+    also expire after `ttl` seconds and are rendered again.
+
+    ETags are a digest of the body, so a re-rendered body keeps its tag unless
+    the courts really changed, and a changed one never reuses a stale tag.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 30):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.modified_at = time.time()
+        self.responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        # (etag, last_modified) last sent per key, outliving the body's TTL
+        self.validators = TTLCache(maxsize=maxsize, ttl=None)
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.modified_at = time.time()
+        self.responses.clear()
+
+    def get(self, key) -> Optional[CatalogEntry]:
+        entry = self.responses.get(key)
+        if entry is not None and entry.version == self.version:
+            return entry
+        return None
+
+    def current_version(self) -> int:
+        return self.version
+
+    def put(self, key, version: int, body: bytes) -> CatalogEntry:
+        """Store `body` rendered at `version`; stale renders are returned but not cached."""
+        etag = f'"courts-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        previous = self.validators.get(key)
+        if previous is not None and previous[0] == etag:
+            last_modified = previous[1]
+        else:
+            # First render of the key, or the courts changed since the last one
+            last_modified = formatdate(self.modified_at if previous is None else time.time(), usegmt=True)
+            self.validators.set(key, (etag, last_modified))
+        entry = CatalogEntry(version=version, body=body, etag=etag, last_modified=last_modified)
+        if version == self.version:
+            self.responses.set(key, entry)
+        return entry
+
+    def stats(self) -> dict:
+        return dict(self.responses.stats(), version=self.version)
+
+
+def not_modified(entry: CatalogEntry, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Evaluate conditional GET headers against a cached entry (If-None-Match wins)."""
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags or f"W/{entry.etag}" in tags
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(entry.last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+court_catalog = CourtCatalogCache(
+    maxsize=int(os.getenv("COURT_CATALOG_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("COURT_CATALOG_TTL", 30)) or None,
+)
@@ -0,0 +1,127 @@
+"""
+Live availability of one court on one day, pushed as server-sent events.
+
+A subscriber first gets a `snapshot` event with the day's bookings (the same
+list /api/reserves_by_day returns) and then a `slot-taken` or `slot-freed`
+event per booking created or deleted on that court-day. crud publishes the
+events after each commit, next to the occupancy index update.
+
+Every subscriber has a bounded queue. A consumer that falls QUEUE_SIZE events
+behind is dropped: its queue is emptied, it gets a `dropped` event and the
+stream ends, and an EventSource client reconnects and starts over from a fresh
+snapshot. Publishing therefore never waits on a slow client.
+
+The hub lives in the process and is only used from the event loop thread, like
+the occupancy index it mirrors.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from pydantic import TypeAdapter
+
+from . import schemas
+from .occupancy import Booking, court_occupancy
+
+COURT_EVENTS_QUEUE_SIZE = int(os.getenv("COURT_EVENTS_QUEUE_SIZE", 64))
+KEEPALIVE_SECONDS = 15
+RECONNECT_MILLISECONDS = 3000
+
+SLOT_TAKEN = "slot-taken"
+SLOT_FREED = "slot-freed"
+
+booking_adapter = TypeAdapter(schemas.Reservation)
+bookings_adapter = TypeAdapter(list[schemas.Reservation])
+
+
+def sse_message(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+class Subscriber:
+    __slots__ = ("key", "queue", "dropped")
+
+    def __init__(self, key: Tuple[int, date], queue_size: int):
+        self.key = key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class CourtEventHub:
+    def __init__(self, queue_size: int = COURT_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Dict[Tuple[int, date], Set[Subscriber]] = defaultdict(set)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, court_id: int, day: date) -> Subscriber:
+        subscriber = Subscriber((court_id, day), self.queue_size)
+        self.subscribers[subscriber.key].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.key]
+
+    def publish(self, event: str, bookings: Iterable[Booking]):
+        for booking in bookings:
+            subscribers = self.subscribers.get((booking.court_id, booking.start_date_time.date()))
+            if not subscribers:
+                continue
+            # Serialized once, however many clients watch the court-day
+            message = sse_message(event, booking_adapter.dump_json(booking_adapter.validate_python(booking, from_attributes=True)))
+            self.published += 1
+            for subscriber in list(subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    self.drop(subscriber)
+
+    def drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "court_days": len(self.subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self.subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    async def stream(self, court_id: int, day_start: datetime, day_end: datetime):
+        """
+        SSE body for one court-day. Subscribing happens on the first iteration,
+        so a response that is never sent leaves no subscriber behind, and the
+        snapshot is read with no await in between, so no event is missed.
+        """
+        subscriber = self.subscribe(court_id, day_start.date())
+        snapshot = court_occupancy.bookings_between(court_id, day_start, day_end)
+        try:
+            yield b"retry: " + str(RECONNECT_MILLISECONDS).encode() + b"\n\n"
+            yield sse_message("snapshot", bookings_adapter.dump_json(bookings_adapter.validate_python(snapshot, from_attributes=True)))
+            while True:
+                try:
+                    message: Optional[bytes] = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield sse_message("dropped", json.dumps({"reason": "slow consumer"}).encode())
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+court_events = CourtEventHub()
@@ -1,84 +1,145 @@
+import asyncio
 import hashlib
+import hmac
 import os
-from base64 import b64encode, b64decode
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import extract, func
-from datetime import datetime
-from . import models, schemas
+from base64 import b64encode, b64decode, urlsafe_b64encode, urlsafe_b64decode
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from sqlalchemy import Float, and_, cast, delete, func, insert, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from . import aggregates, availability, models, schemas
+from .hashing import hashing_pool
+from .occupancy import (
+    DEFAULT_SLOT, SLOTS_PER_DAY, court_occupancy, booking_from_reservation, normalize, slot_indexes, slot_rows
+)
+from .court_catalog import court_catalog
+from .court_events import SLOT_FREED, SLOT_TAKEN, court_events
+from .coalescing import court_catalog_reads, day_bookings_reads, day_key
+from .principals import principal_cache, principal_from_user
+from .permissions import DEFAULT_ROLE_PERMISSIONS, role_permissions
+from .revocation import token_revocations
 from typing import List, Optional
 
-def hash_password(password: str) -> str:
+# PBKDF2 work factor for new hashes; stored hashes keep the count they were made with
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 100000))
+LEGACY_HASH_ITERATIONS = 100000  # hashes stored without a prefix used a fixed count
+HASH_PREFIX = "pbkdf2_sha256"
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
     salt = os.urandom(16)  # Generate a 16-byte salt
     password_bytes = password.encode('utf-8')  # Encode password to bytes
-    hashed_password = hashlib.pbkdf2_hmac('sha256', password_bytes, salt, 100000)
-    return b64encode(salt + hashed_password).decode('utf-8')
+    hashed_password = hashlib.pbkdf2_hmac('sha256', password_bytes, salt, iterations)
+    encoded = b64encode(salt + hashed_password).decode('utf-8')
+    return f"{HASH_PREFIX}${iterations}${encoded}"
+
+def split_password_hash(hashed_password: str):
+    """Return (iterations, salt, hash) for both prefixed and legacy stored hashes."""
+    if hashed_password.startswith(HASH_PREFIX + "$"):
+        _, iterations, encoded = hashed_password.split("$", 2)
+        iterations = int(iterations)
+    else:
+        iterations, encoded = LEGACY_HASH_ITERATIONS, hashed_password
+    decoded = b64decode(encoded.encode('utf-8'))
+    return iterations, decoded[:16], decoded[16:]  # 16-byte salt, then the actual hash
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    decoded = b64decode(hashed_password.encode('utf-8'))
-    salt = decoded[:16]  # Extract the first 16 bytes as the salt
-    stored_hash = decoded[16:]  # The rest is the actual hash
+    iterations, salt, stored_hash = split_password_hash(hashed_password)
     password_bytes = plain_password.encode('utf-8')
-    new_hash = hashlib.pbkdf2_hmac('sha256', password_bytes, salt, 100000)
-    return new_hash == stored_hash
-
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
-
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
-
-def get_all_employees(db: Session):
-    return db.query(models.User).filter(models.User.role == models.RoleEnum.EMPLOYEE).all()
+    new_hash = hashlib.pbkdf2_hmac('sha256', password_bytes, salt, iterations)
+    return hmac.compare_digest(new_hash, stored_hash)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return not hashed_password.startswith(f"{HASH_PREFIX}${PASSWORD_HASH_ITERATIONS}$")
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def rehash_user_password(db: AsyncSession, user: models.User, password: str):
+    user.hashed_password = await hash_password_async(password)
+    await db.commit()
+    return user
+
+async def get_user(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models.User).filter(models.User.id == user_id))
+    return result.scalars().first()
+
+async def get_principal(db: AsyncSession, user_id: int):
+    """Return the cached Principal for user_id, loading it only on a cache miss."""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        # An update or delete committing while we load invalidates the row we read
+        generation = principal_cache.generation
+        user = await get_user(db, user_id)
+        if user is None:
+            return None
+        principal = principal_from_user(user)
+        principal_cache.set(user_id, principal, generation)
+    return principal
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).filter(models.User.email == email))
+    return result.scalars().first()
+
+async def get_all_employees(db: AsyncSession):
+    result = await db.execute(select(models.User).filter(models.User.role == models.RoleEnum.EMPLOYEE))
+    return result.scalars().all()
 
 # def get_users(db: Session, skip: int = 0, limit: int = 100):
 #     return db.query(models.User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = hash_password(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await hash_password_async(user.password)
     db_user = models.User(
         username=user.username,
-        email=user.email, 
-        phonenumber=user.phonenumber, 
+        email=user.email,
+        phonenumber=user.phonenumber,
         avatar_url=user.avatar_url,
         hashed_password=hashed_password,
         # role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await aggregates.apply_user_delta(db, users=1, active=1)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def create_employee(db: Session, user: schemas.EmployeeCreate):
-    hashed_password = hash_password(user.password)
+async def create_employee(db: AsyncSession, user: schemas.EmployeeCreate):
+    hashed_password = await hash_password_async(user.password)
     db_user = models.User(
         username=user.username,
-        email=user.email, 
-        phonenumber=user.phonenumber, 
+        email=user.email,
+        phonenumber=user.phonenumber,
         avatar_url=user.avatar_url,
         hashed_password=hashed_password,
         role=models.RoleEnum.EMPLOYEE
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await aggregates.apply_user_delta(db, users=1, active=1)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def create_manager(db: Session, user: schemas.ManagerCreate):
-    hashed_password = hash_password(user.password)
+async def create_manager(db: AsyncSession, user: schemas.ManagerCreate):
+    hashed_password = await hash_password_async(user.password)
     db_user = models.User(
         username=user.username,
-        email=user.email, 
-        phonenumber=user.phonenumber, 
-        avatar_url=user.avatar_url, 
+        email=user.email,
+        phonenumber=user.phonenumber,
+        avatar_url=user.avatar_url,
         hashed_password=hashed_password,
         role=models.RoleEnum.MANAGER
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await aggregates.apply_user_delta(db, users=1, active=1)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def create_court(db: Session, court: schemas.CourtCreate):
+async def create_court(db: AsyncSession, court: schemas.CourtCreate):
     db_court = models.Court(
         court_name=court.court_name,
         court_type=court.court_type,
@@ -89,132 +150,495 @@ def create_court(db: Session, court: schemas.CourtCreate):
         description=court.description
     )
     db.add(db_court)
-    db.commit()
-    db.refresh(db_court)
+    await db.commit()
+    await db.refresh(db_court)
+    court_catalog.invalidate()
+    court_catalog_reads.invalidate()
+    day_bookings_reads.invalidate()
     return db_court
 
-def get_users(db: Session):
-    return db.query(models.User).filter(models.User.role == models.RoleEnum.CUSTOMER).all()
+async def get_users(db: AsyncSession):
+    result = await db.execute(select(models.User).filter(models.User.role == models.RoleEnum.CUSTOMER))
+    return result.scalars().all()
+
+async def get_courts(db: AsyncSession, available: Optional[bool] = None):
+    query = select(models.Court)
+    # Optional availability filter
+    if available is not None:
+        query = query.filter(models.Court.is_available == available)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def get_court_by_id(db: AsyncSession, court_id: int):
+    result = await db.execute(select(models.Court).filter(models.Court.id == court_id))
+    return result.scalars().first()
+
+async def get_reserves(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Reservation).offset(skip).limit(limit))
+    return result.scalars().all()
+
+def with_court_and_reservor(query):
+    """Inner join court and reservor and fill both relationships from that same join."""
+    return query.join(models.Reservation.court).join(models.Reservation.reservor).options(
+        contains_eager(models.Reservation.court),
+        contains_eager(models.Reservation.reservor),
+    )
 
-def get_court_by_id(db: Session, court_id: int):
-    return db.query(models.Court).filter(models.Court.id == court_id).first()
+async def get_all_reserves(db: AsyncSession):
+    result = await db.execute(
+        with_court_and_reservor(select(models.Reservation))
+    )
+    return result.scalars().all()
 
-def get_reserves(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Reservation).offset(skip).limit(limit).all()
+def encode_reserve_cursor(start_date_time: datetime, reservation_id: int) -> str:
+    key = f"{start_date_time.isoformat()}|{reservation_id}"
+    return urlsafe_b64encode(key.encode('utf-8')).decode('utf-8')
 
-def get_all_reserves(db: Session):
-    return db.query(models.Reservation).join(models.Court).join(models.User).all()
+def decode_reserve_cursor(cursor: str):
+    """Return the (start_date_time, id) keyset position; raises ValueError if malformed."""
+    try:
+        start, reservation_id = urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8').split("|")
+        return datetime.fromisoformat(start), int(reservation_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def apply_reserve_filters(
+    query,
+    court_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Filter a reservations query and order it by the (start_date_time, id) keyset."""
+    query = query.order_by(models.Reservation.start_date_time, models.Reservation.id)
+    if court_id is not None:
+        query = query.filter(models.Reservation.court_id == court_id)
+    if user_id is not None:
+        query = query.filter(models.Reservation.reservor_id == user_id)
+    if status is not None:
+        query = query.filter(models.Reservation.status == status)
+    if start is not None:
+        query = query.filter(models.Reservation.start_date_time >= start.replace(tzinfo=None))
+    if end is not None:
+        query = query.filter(models.Reservation.start_date_time < end.replace(tzinfo=None))
+    return query
+
+def after_reserve_cursor(query, cursor: Optional[str]):
+    if not cursor:
+        return query
+    after_start, after_id = decode_reserve_cursor(cursor)
+    return query.filter(or_(
+        models.Reservation.start_date_time > after_start,
+        and_(models.Reservation.start_date_time == after_start, models.Reservation.id > after_id),
+    ))
+
+def filtered_reserves_query(**filters):
+    """Reservations with court and reservor, ordered by the (start_date_time, id) keyset."""
+    return apply_reserve_filters(with_court_and_reservor(select(models.Reservation)), **filters)
+
+async def get_reserves_page(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None, **filters):
+    """Return one page of reservations after `cursor` and the cursor of the next page, if any."""
+    query = after_reserve_cursor(filtered_reserves_query(**filters), cursor)
+    result = await db.execute(query.limit(limit + 1))
+    reservations = result.scalars().all()
+    last = reservations[limit - 1] if len(reservations) > limit else None
+    next_cursor = encode_reserve_cursor(last.start_date_time, last.id) if last is not None else None
+    return reservations[:limit], next_cursor
+
+# Read models: the list endpoints below select only the columns their response
+# needs and return plain dicts for the precompiled serializers in schemas, which
+# skips ORM hydration, identity map bookkeeping and per-row model validation.
+
+RESERVATION_ROW_COLUMNS = (
+    models.Reservation.id, models.Reservation.start_date_time, models.Reservation.end_date_time,
+    models.Reservation.rate, models.Reservation.status,
+    models.Court.id, models.Court.court_name, models.Court.court_type, models.Court.description,
+    models.Court.capacity, cast(models.Court.hourly_rate, Float), models.Court.is_available, models.Court.images,
+    models.User.id, models.User.email, models.User.username, models.User.phonenumber,
+    models.User.avatar_url, models.User.is_active, models.User.role,
+)
+
+def reservation_row(row) -> dict:
+    (id, start_date_time, end_date_time, rate, status,
+     court_id, court_name, court_type, description, capacity, hourly_rate, is_available, images,
+     user_id, email, username, phonenumber, avatar_url, is_active, role) = row
+    return {
+        "id": id, "start_date_time": start_date_time, "end_date_time": end_date_time,
+        "rate": rate, "status": status,
+        "court": {
+            "id": court_id, "court_name": court_name, "court_type": court_type, "description": description,
+            "capacity": capacity, "hourly_rate": hourly_rate, "is_available": is_available, "images": images,
+        },
+        "reservor": {
+            "id": user_id, "email": email, "username": username, "phonenumber": phonenumber,
+            "avatar_url": avatar_url, "is_active": is_active, "role": role,
+        },
+    }
+
+def reserve_rows_query(**filters):
+    query = (
+        select(*RESERVATION_ROW_COLUMNS)
+        .join(models.Court, models.Reservation.court_id == models.Court.id)
+        .join(models.User, models.Reservation.reservor_id == models.User.id)
+    )
+    return apply_reserve_filters(query, **filters)
+
+async def get_reserve_rows(db: AsyncSession, **filters):
+    """Every matching reservation as schemas.ReservationRow dicts, in keyset order."""
+    result = await db.execute(reserve_rows_query(**filters))
+    return [reservation_row(row) for row in result.tuples()]
+
+async def get_reserve_rows_page(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None, **filters):
+    """Same page as get_reserves_page, as schemas.ReservationRow dicts."""
+    query = after_reserve_cursor(reserve_rows_query(**filters), cursor)
+    result = await db.execute(query.limit(limit + 1))
+    rows = [reservation_row(row) for row in result.tuples()]
+    last = rows[limit - 1] if len(rows) > limit else None
+    next_cursor = encode_reserve_cursor(last["start_date_time"], last["id"]) if last is not None else None
+    return rows[:limit], next_cursor
+
+USER_ROW_COLUMNS = (
+    models.User.id, models.User.email, models.User.username, models.User.phonenumber,
+    models.User.avatar_url, models.User.is_active, models.User.role,
+)
+
+EMPLOYEE_ROW_COLUMNS = (
+    models.User.id, models.User.username, models.User.email, models.User.phonenumber,
+    models.User.is_active, models.User.role,
+)
+
+async def get_user_rows(db: AsyncSession, role: models.RoleEnum = models.RoleEnum.CUSTOMER, columns=USER_ROW_COLUMNS):
+    """Users with `role` as dicts of `columns` (schemas.UserRow by default)."""
+    result = await db.execute(select(*columns).filter(models.User.role == role))
+    return [row._asdict() for row in result]
+
+async def get_employee_rows(db: AsyncSession):
+    return await get_user_rows(db, models.RoleEnum.EMPLOYEE, EMPLOYEE_ROW_COLUMNS)
+
+async def get_task_rows(db: AsyncSession):
+    """All tasks with the assigned employee as schemas.TaskRow dicts."""
+    result = await db.execute(
+        select(
+            models.Task.id, models.Task.title, models.Task.description, models.Task.due_date,
+            models.Task.status, models.Task.assigned_to, models.Task.created_at,
+            models.User.username, models.User.email,
+        ).outerjoin(models.User, models.Task.assigned_to == models.User.id)
+    )
+    return [
+        {
+            "id": id, "title": title, "description": description, "due_date": due_date,
+            "status": status, "assigned_to": assigned_to, "created_at": created_at,
+            "user": {"username": username, "email": email} if email is not None else None,
+        }
+        for id, title, description, due_date, status, assigned_to, created_at, username, email in result.tuples()
+    ]
 
-def get_reserves_by_id(db: Session, user_id: int):
-    return db.query(models.Reservation).filter(models.Reservation.reservor_id == user_id).all()
+async def stream_reserves(db: AsyncSession, batch_size: int = 500, **filters):
+    """Yield matching reservations as schemas.ReservationRow dicts, fetching them in batches."""
+    result = await db.stream(reserve_rows_query(**filters).execution_options(yield_per=batch_size))
+    async for row in result.tuples():
+        yield reservation_row(row)
 
+async def get_reserves_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(models.Reservation).filter(models.Reservation.reservor_id == user_id))
+    return result.scalars().all()
 
-def get_current_reserves_by_id(db: Session, user_id: int):
+
+async def get_current_reserves_by_id(db: AsyncSession, user_id: int):
     current_time = datetime.now()
-    return db.query(models.Reservation).join(models.Court).filter(
-        models.Reservation.reservor_id == user_id,
-        models.Reservation.start_date_time >= current_time
-    ).all()
+    result = await db.execute(
+        with_court_and_reservor(select(models.Reservation)).filter(
+            models.Reservation.reservor_id == user_id,
+            models.Reservation.start_date_time >= current_time
+        )
+    )
+    return result.scalars().all()
 
-def get_past_reserves_by_id(db: Session, user_id: int):
+async def get_past_reserves_by_id(db: AsyncSession, user_id: int):
     current_time = datetime.now()
-    return db.query(models.Reservation).join(models.Court).filter(
-        models.Reservation.reservor_id == user_id,
-        models.Reservation.start_date_time < current_time
-    ).all()
-
-def get_reserves_by_day(db: Session, court_id: int, start_date_time: datetime):
-    input_date = start_date_time.replace(tzinfo=None)
-    matching_reservations = db.query(models.Reservation).filter(
+    result = await db.execute(
+        with_court_and_reservor(select(models.Reservation)).filter(
+            models.Reservation.reservor_id == user_id,
+            models.Reservation.start_date_time < current_time
+        )
+    )
+    return result.scalars().all()
+
+def day_bounds(start_date_time: datetime):
+    """Return the half-open [day_start, day_end) range containing start_date_time."""
+    day_start = start_date_time.replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    return day_start, day_start + timedelta(days=1)
+
+def court_reserves_query(court_id: int, start: datetime, end: datetime):
+    """Reservations of a court starting in [start, end), answered by ix_reservations_court_start."""
+    return select(models.Reservation).filter(
         models.Reservation.court_id == court_id,
-        extract('year', models.Reservation.start_date_time) == input_date.year,
-        extract('month', models.Reservation.start_date_time) == input_date.month,
-        extract('day', models.Reservation.start_date_time) == input_date.day,
-    ).all()
-    return matching_reservations
+        models.Reservation.start_date_time >= start,
+        models.Reservation.start_date_time < end,
+    )
 
-def get_check_reserves(db: Session, court_id: int, start_date_time: datetime):
+async def get_check_reserves(db: AsyncSession, court_id: int, start_date_time: datetime):
     if isinstance(start_date_time, str):
         start_date_time = datetime.fromisoformat(start_date_time)
-    input_date = start_date_time.replace(tzinfo=None)
-    matching_reservations = db.query(models.Reservation).filter(
-        models.Reservation.court_id == court_id,
-        extract('year', models.Reservation.start_date_time) == input_date.year,
-        extract('month', models.Reservation.start_date_time) == input_date.month,
-        extract('day', models.Reservation.start_date_time) == input_date.day,
-        extract('hour', models.Reservation.start_date_time) == input_date.hour,
-    ).all()
-    
-    return matching_reservations
-
-def create_user_reservation(db: Session, reservation: schemas.ReservationCreate, user_id: int):
+    hour_start = start_date_time.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    result = await db.execute(court_reserves_query(court_id, hour_start, hour_start + timedelta(hours=1)))
+
+    return result.scalars().all()
+
+async def get_day_bookings(db: AsyncSession, court_id: int, start_date_time: datetime):
+    await court_occupancy.ensure_loaded(db)
+    day_start, day_end = day_bounds(start_date_time)
+    return court_occupancy.bookings_between(court_id, day_start, day_end)
+
+async def get_conflicting_reserves(db: AsyncSession, court_id: int, start_date_time: datetime, end_date_time: datetime):
+    await court_occupancy.ensure_loaded(db)
+    return court_occupancy.slot_conflicts(court_id, start_date_time, end_date_time)
+
+async def search_availability(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    duration: int = 1,
+    court_type: Optional[str] = None,
+    min_capacity: Optional[int] = None,
+    limit: int = 200,
+):
+    """Free windows across all matching courts; bookings come from the occupancy index."""
+    query = select(models.Court).filter(models.Court.is_available == True)
+    if court_type is not None:
+        query = query.filter(models.Court.court_type == court_type)
+    if min_capacity is not None:
+        query = query.filter(models.Court.capacity >= min_capacity)
+    courts = (await db.execute(query.order_by(models.Court.id))).scalars().all()
+
+    await court_occupancy.ensure_loaded(db)
+    bookings = {court.id: court_occupancy.conflicts(court.id, start, end) for court in courts}
+    return availability.find_free_windows(courts, bookings, start, end, duration, limit)
+
+def bookings_changed(event: str, bookings):
+    """Tell readers about committed bookings: drop cached day listings and notify subscribers."""
+    for booking in bookings:
+        day_bookings_reads.invalidate(day_key(booking.court_id, day_bounds(booking.start_date_time)[0]))
+    court_events.publish(event, bookings)
+
+class SlotTaken(Exception):
+    """Another reservation already holds a slot of the requested court and time."""
+
+# Reservation write transactions take turns within the process. reservation_slots still
+# decides who wins; this only keeps hundreds of simultaneous bookings from piling onto
+# SQLite's write lock, whose busy handler backs off and can starve a writer past its timeout.
+reservation_writes = asyncio.Lock()
+
+
+async def hold_slots(db: AsyncSession, reservations):
+    """
+    Insert the reservation_slots rows of freshly flushed reservations. The primary
+    key rejects a slot held by a concurrent booking; the transaction is rolled
+    back and SlotTaken raised.
+    """
+    rows = []
+    for reservation in reservations:
+        booking = booking_from_reservation(reservation)
+        rows.extend(slot_rows(booking.id, booking.court_id, booking.start_date_time, booking.end_date_time))
+    if not rows:
+        return
+    try:
+        await db.execute(insert(models.ReservationSlot), rows)
+    except IntegrityError:
+        await db.rollback()
+        raise SlotTaken()
+
+async def ensure_reservation_slots(db: AsyncSession, chunk_size: int = 10000) -> int:
+    """
+    Fill reservation_slots from the reservations on first start, e.g. for a database
+    created before the table existed. Slots already held by an earlier reservation of
+    the same court (old double bookings) are left out; their number is returned.
+    """
+    if await db.scalar(select(models.ReservationSlot.court_id).limit(1)) is not None:
+        return 0
+    result = await db.execute(
+        select(models.Reservation.id, models.Reservation.court_id,
+               models.Reservation.start_date_time, models.Reservation.end_date_time)
+        .filter(models.Reservation.court_id.is_not(None), models.Reservation.start_date_time.is_not(None))
+        .order_by(models.Reservation.court_id, models.Reservation.start_date_time, models.Reservation.id)
+    )
+    rows, held, court_id, skipped = [], set(), None, 0
+    for reservation_id, reservation_court_id, start, end in result.tuples():
+        if reservation_court_id != court_id:
+            held, court_id = set(), reservation_court_id
+        for row in slot_rows(reservation_id, court_id, start, end or start + DEFAULT_SLOT):
+            if row["slot_index"] in held:
+                skipped += 1
+                continue
+            held.add(row["slot_index"])
+            rows.append(row)
+    for offset in range(0, len(rows), chunk_size):
+        await db.execute(insert(models.ReservationSlot), rows[offset:offset + chunk_size])
+    await db.commit()
+    return skipped
+
+async def create_user_reservation(db: AsyncSession, reservation: schemas.ReservationCreate, user_id: int):
     db_reservation = models.Reservation(
-        **reservation.dict(), 
+        **reservation.dict(),
         reservor_id=user_id
     )
-    db.add(db_reservation)
-    db.commit()
-    db.refresh(db_reservation)
+    async with reservation_writes:
+        db.add(db_reservation)
+        await db.flush()  # resolves the default rate before it is counted
+        await hold_slots(db, [db_reservation])
+        await aggregates.apply_reservation_delta(db, db_reservation.court_id, db_reservation.start_date_time, 1, db_reservation.rate or 0)
+        await db.commit()
+    await db.refresh(db_reservation)
+    court_occupancy.add(db_reservation)
+    bookings_changed(SLOT_TAKEN, [booking_from_reservation(db_reservation)])
     return db_reservation
 
+RECURRENCE_STEPS = {
+    schemas.RecurrenceFrequency.DAILY: timedelta(days=1),
+    schemas.RecurrenceFrequency.WEEKLY: timedelta(weeks=1),
+}
+
+def expand_recurrence(rule: schemas.RecurringReservationCreate, limit: Optional[int] = None):
+    """
+    Return the (start, end) pairs of every occurrence up to and including rule.until.
+    With `limit`, stops after limit + 1 occurrences, enough to tell that the rule asks
+    for too many. Raises OverflowError when an occurrence ends past datetime.max.
+    """
+    step = RECURRENCE_STEPS[rule.frequency]
+    start = normalize(rule.start_date_time)
+    duration = normalize(rule.end_date_time) - start
+    occurrences = []
+    while start.date() <= rule.until:
+        occurrences.append((start, start + duration))
+        if limit is not None and len(occurrences) > limit:
+            break
+        try:
+            start += step
+        except OverflowError:
+            break  # the next occurrence would start after any until date
+    return occurrences
+
+async def create_recurring_reservations(db: AsyncSession, rule: schemas.RecurringReservationCreate, user_id: int):
+    """
+    Book every occurrence of `rule` that is free. Conflicts are checked against the
+    occupancy index in one pass and the accepted occurrences are inserted in a
+    single transaction with one executemany. Occurrences whose slots fall outside
+    the datetime range raise OverflowError before anything is written.
+    """
+    await court_occupancy.ensure_loaded(db)
+    skip_dates = set(rule.skip_dates)
+    results = []
+    accepted = []
+    for start, end in expand_recurrence(rule):
+        if start.date() in skip_dates:
+            results.append(schemas.OccurrenceResult(start_date_time=start, end_date_time=end, status="skipped"))
+            continue
+        conflicts = court_occupancy.slot_conflicts(rule.court_id, start, end)
+        if conflicts:
+            results.append(schemas.OccurrenceResult(
+                start_date_time=start, end_date_time=end, status="conflict",
+                conflicting_ids=[booking.id for booking in conflicts],
+            ))
+            continue
+        result = schemas.OccurrenceResult(start_date_time=start, end_date_time=end, status="created")
+        results.append(result)
+        accepted.append(result)
+
+    if accepted:
+        async with reservation_writes:
+            reservations = (await db.scalars(
+                insert(models.Reservation).returning(models.Reservation),
+                [
+                    {"start_date_time": result.start_date_time, "end_date_time": result.end_date_time,
+                     "court_id": rule.court_id, "reservor_id": user_id}
+                    for result in accepted
+                ],
+            )).all()
+            await hold_slots(db, reservations)
+            await aggregates.apply_reservation_deltas(db, [
+                (reservation.court_id, reservation.start_date_time, 1, reservation.rate or 0)
+                for reservation in reservations
+            ])
+            await db.commit()
+        by_start = {reservation.start_date_time: reservation for reservation in reservations}
+        for result in accepted:
+            reservation = by_start[result.start_date_time]
+            result.reservation_id = reservation.id
+            court_occupancy.add(reservation)
+        bookings_changed(SLOT_TAKEN, [booking_from_reservation(reservation) for reservation in reservations])
+
+    return schemas.RecurringReservationResult(
+        created=len(accepted),
+        conflicts=sum(1 for result in results if result.status == "conflict"),
+        skipped=sum(1 for result in results if result.status == "skipped"),
+        occurrences=results,
+    )
+
 
-def delete_user(db: Session, user_id: int):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def delete_user(db: AsyncSession, user_id: int):
+    user = await get_user(db, user_id)
     if user:
-        db.delete(user)
-        db.commit()
+        await aggregates.apply_user_delta(db, users=-1, active=-1 if user.is_active else 0)
+        await token_revocations.revoke(db, user_id)
+        await db.delete(user)
+        await db.commit()
+        principal_cache.invalidate(user_id)
         return True
     return False
 
-def update_user(db: Session, user_id: int, user_data: schemas.UserUpdate):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def update_user(db: AsyncSession, user_id: int, user_data: schemas.UserUpdate):
+    user = await get_user(db, user_id)
     if user:
+        was_active = bool(user.is_active)
         update_data = user_data.model_dump(exclude_unset=True)
+        # Every updatable field is carried in stateless access tokens
+        claims_changed = any(getattr(user, key) != value for key, value in update_data.items())
         for key, value in update_data.items():
             setattr(user, key, value)
-        db.commit()
-        db.refresh(user)
+        if bool(user.is_active) != was_active:
+            await aggregates.apply_user_delta(db, active=1 if user.is_active else -1)
+        if claims_changed:
+            await token_revocations.revoke(db, user_id)
+        await db.commit()
+        await db.refresh(user)
+        principal_cache.invalidate(user_id)
         return user
     return None
 
-def get_all_tasks(db: Session):
-    try:
-        tasks = (
-            db.query(models.Task)
-            .options(joinedload(models.Task.user))
-            .all()
-        )
-        print(f"Tasks found: {len(tasks)}") # Debug log
-        for task in tasks:
-            print(f"Task {task.id}: assigned_to={task.assigned_to}, user={task.user}") # Debug log
-        return tasks
-    except Exception as e:
-        print(f"Error getting tasks: {e}")
-        return []
+async def get_all_tasks(db: AsyncSession):
+    result = await db.execute(
+        select(models.Task)
+        .options(joinedload(models.Task.user))
+    )
+    return result.scalars().all()
 
-def get_employee_tasks(db: Session, employee_id: int):
-    return db.query(models.Task).filter(models.Task.employee_id == employee_id).all()
+async def get_employee_tasks(db: AsyncSession, employee_id: int):
+    result = await db.execute(select(models.Task).filter(models.Task.employee_id == employee_id))
+    return result.scalars().all()
 
-def get_task(db: Session, task_id: int):
-    return db.query(models.Task).filter(models.Task.id == task_id).first()
+async def get_task(db: AsyncSession, task_id: int):
+    result = await db.execute(select(models.Task).filter(models.Task.id == task_id))
+    return result.scalars().first()
 
-def update_task(db: Session, task_id: int, task_data: schemas.TaskUpdate):
-    task = get_task(db, task_id)
+async def update_task(db: AsyncSession, task_id: int, task_data: schemas.TaskUpdate):
+    task = await get_task(db, task_id)
     if task:
         update_data = task_data.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(task, key, value)
-        db.commit()
-        db.refresh(task)
+        await db.commit()
+        await db.refresh(task)
         return task
     return None
 
-def get_employee_tasks_by_id(db: Session, employee_id: int):
-    return db.query(models.Task).filter(
+async def get_employee_tasks_by_id(db: AsyncSession, employee_id: int):
+    result = await db.execute(select(models.Task).filter(
         models.Task.assigned_to == employee_id
-    ).all()
+    ))
+    return result.scalars().all()
 
-def assign_task(db: Session, task: schemas.TaskCreate, employee_id: int):
+async def assign_task(db: AsyncSession, task: schemas.TaskCreate, employee_id: int):
     db_task = models.Task(
         title=task.title,
         description=task.description,
@@ -223,78 +647,95 @@ def assign_task(db: Session, task: schemas.TaskCreate, employee_id: int):
         assigned_to=employee_id
     )
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
     return db_task
 
-def update_task(db: Session, task_id: int, task_data: schemas.TaskUpdate):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+async def update_task(db: AsyncSession, task_id: int, task_data: schemas.TaskUpdate):
+    task = await get_task(db, task_id)
     if task:
         for key, value in task_data.items():
             setattr(task, key, value)
-        db.commit()
-        db.refresh(task)
+        await db.commit()
+        await db.refresh(task)
         return task
     return None
 
-def get_total_users_count(db: Session):
-    return db.query(models.User).count()
+async def get_reservation_trends(db: AsyncSession, start: datetime, end: datetime, granularity: str = "month", court_id: Optional[int] = None):
+    return await aggregates.get_trends(db, start=start, end=end, granularity=granularity, court_id=court_id)
 
-def get_active_users_count(db: Session):
+async def get_month_occupancy(db: AsyncSession, month_start: datetime, days: int) -> List[dict]:
     """
-    Returns the count of active users in the database.
-
-    Args:
-        db (Session): The database session used to query the user records.
-
-    Returns:
-        int: The number of active users.
+    Booked hours of every court per day from month_start, as one slot bitmap per day.
+    A single grouped query over reservation_slots: slots are unique per court, so
+    summing 1 << hour builds the same value as OR-ing the bits.
     """
-
-    return db.query(models.User).filter(models.User.is_active == True).count()
-
-def get_total_reservations_count(db: Session):
-    return db.query(models.Reservation).count()
-
-def get_month_reservations_count(db: Session):
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    return db.query(models.Reservation).filter(
-        extract('month', models.Reservation.start_date_time) == current_month,
-        extract('year', models.Reservation.start_date_time) == current_year
-    ).count()
-
-def calculate_total_revenue(db: Session):
-    total = db.query(func.sum(models.Reservation.rate)).scalar() or 0
-    return total
-
-def calculate_month_revenue(db: Session):
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    month_revenue = db.query(func.sum(models.Reservation.rate)).filter(
-        extract('month', models.Reservation.start_date_time) == current_month,
-        extract('year', models.Reservation.start_date_time) == current_year
-    ).scalar() or 0
-    return month_revenue
-
-def get_reservation_trends(db: Session):
-    trends = db.query(
-        func.extract('month', models.Reservation.start_date_time).label('month'),
-        func.count(models.Reservation.id).label('reservations')
-    ).group_by('month').order_by('month').all()
-    
-    return [
-        {"month": trend.month, "reservations": trend.reservations}
-        for trend in trends
-    ]
-
-def get_permissions_by_role(db: Session, role: models.RoleEnum) -> List[str]:
-    return db.query(models.Permission).filter(models.Permission.role == role).all()
-
-def delete_reservation(db: Session, reservation_id: int) -> bool:
-    reservation = db.query(models.Reservation).filter(models.Reservation.id == reservation_id).first()
+    slots = slot_indexes(month_start, month_start + timedelta(days=days))
+    slot = models.ReservationSlot.slot_index
+    day = ((slot - slots.start) // SLOTS_PER_DAY).label("day")
+    result = await db.execute(
+        select(models.Court.id, models.Court.court_name, day, func.sum(literal(1).op("<<")(slot % SLOTS_PER_DAY)))
+        .outerjoin(models.ReservationSlot, and_(
+            models.ReservationSlot.court_id == models.Court.id, slot >= slots.start, slot < slots.stop
+        ))
+        .group_by(models.Court.id, day)
+        .order_by(models.Court.id, day)
+    )
+    courts = {}
+    for court_id, court_name, day_index, bitmap in result.tuples():
+        court = courts.setdefault(court_id, {"court_id": court_id, "court_name": court_name, "hours": [0] * days})
+        if day_index is not None:
+            court["hours"][day_index] = bitmap
+    return list(courts.values())
+
+async def get_dashboard_summary(db: AsyncSession):
+    """Dashboard figures read from the incrementally maintained aggregates."""
+    totals, months = await aggregates.get_summary(db)
+    now = datetime.now()
+    current = next((row for row in months if row.year == now.year and row.month == now.month), None)
+    return {
+        "totalUsers": totals.total_users if totals else 0,
+        "activeUsers": totals.active_users if totals else 0,
+        "totalReservations": totals.total_reservations if totals else 0,
+        "monthReservations": current.reservations if current else 0,
+        "totalRevenue": totals.total_revenue if totals else 0,
+        "monthRevenue": current.revenue if current else 0,
+        "reservationTrends": [
+            {"month": f"{row.year}-{row.month:02d}", "reservations": row.reservations}
+            for row in months if row.reservations
+        ],
+    }
+
+async def ensure_default_permissions(db: AsyncSession) -> bool:
+    """Seed an empty permissions table with DEFAULT_ROLE_PERMISSIONS; False if it already had rows."""
+    if await db.scalar(select(models.Permission.id).limit(1)) is not None:
+        return False
+    db.add_all([
+        models.Permission(role=role, permission=permission)
+        for role, permissions in DEFAULT_ROLE_PERMISSIONS.items()
+        for permission in permissions
+    ])
+    await db.commit()
+    return True
+
+async def set_permissions_by_role(db: AsyncSession, role: models.RoleEnum, permissions: List[models.PermissionEnum]):
+    """Replace the permissions of `role` and recompile the in-memory permission masks."""
+    await db.execute(delete(models.Permission).filter(models.Permission.role == role))
+    db.add_all([models.Permission(role=role, permission=permission) for permission in set(permissions)])
+    await db.commit()
+    await role_permissions.load(db)
+
+async def delete_reservation(db: AsyncSession, reservation_id: int) -> bool:
+    result = await db.execute(select(models.Reservation).filter(models.Reservation.id == reservation_id))
+    reservation = result.scalars().first()
     if reservation:
-        db.delete(reservation)
-        db.commit()
+        booking = booking_from_reservation(reservation)
+        async with reservation_writes:
+            await aggregates.apply_reservation_delta(db, reservation.court_id, reservation.start_date_time, -1, -(reservation.rate or 0))
+            await db.execute(delete(models.ReservationSlot).where(models.ReservationSlot.reservation_id == reservation_id))
+            await db.delete(reservation)
+            await db.commit()
+        court_occupancy.remove(booking)
+        bookings_changed(SLOT_FREED, [booking])
         return True
-    return False
\ No newline at end of file
+    return False
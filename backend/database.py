@@ -1,13 +1,114 @@
-from sqlalchemy import create_engine
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .metrics import METRICS_ENABLED, instrument_engine
+from .profiling import capture_sql
+
+load_dotenv()
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+
+# PRAGMAs applied to every new SQLite connection; SQLITE_TUNING=0 keeps SQLite's defaults
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") != "0"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # readers no longer block the writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # safe with WAL, fsyncs at checkpoints only
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),  # ms to wait for a lock before failing
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -20000)),  # negative values are KiB, so ~20 MB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+}
+
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "0") == "1",
+}
+
+
+def async_url(url: str) -> str:
+    """Swap the default SQLite driver for aiosqlite, leaving explicit drivers alone."""
+    parsed = make_url(url)
+    if parsed.drivername == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+def is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def apply_sqlite_pragmas(sync_engine, pragmas: dict):
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def engine_options(url: str, poolclass) -> dict:
+    options = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if not is_memory_sqlite(url):
+        # Some dialects (aiosqlite) default to NullPool, so ask for a queue pool explicitly
+        options.update(POOL_SETTINGS, poolclass=poolclass)
+    return options
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, tuned: bool = SQLITE_TUNING):
+    """Synchronous engine for `url`, with the SQLite PRAGMA profile when tuned."""
+    engine = create_engine(url, **engine_options(url, QueuePool))
+    if tuned and engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    return engine
+
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, tuned: bool = SQLITE_TUNING):
+    """Async counterpart of make_engine, using aiosqlite for SQLite URLs."""
+    url = async_url(url)
+    engine = create_async_engine(url, **engine_options(url, AsyncAdaptedQueuePool))
+    if tuned and engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine.sync_engine, SQLITE_PRAGMAS)
+    return engine
+
+
+def describe_engine(engine) -> dict:
+    """Effective settings of a synchronous engine, read back from a live connection."""
+    report = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool": type(engine.pool).__name__,
+        "pool_size": getattr(engine.pool, "size", lambda: None)(),
+    }
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            for name in SQLITE_PRAGMAS:
+                report[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    return report
+
+
+# Synchronous engine, used for schema creation and scripts
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = engine)
 
+# Async engine used by the API so queries don't block the event loop
+async_engine = make_async_engine()
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush = False, expire_on_commit = False)
+
+if METRICS_ENABLED:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+capture_sql(async_engine.sync_engine)
+
 Base = declarative_base()
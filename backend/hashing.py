@@ -0,0 +1,48 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# hashlib.pbkdf2_hmac releases the GIL, so a thread pool runs hashes in parallel
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", min(4, os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 64))
+
+
+class HashingPoolBusy(Exception):
+    """Raised when more password hashes are queued than HASH_QUEUE_LIMIT allows."""
+
+
+class HashingPool:
+    """
+    Runs CPU heavy password hashing off the event loop on a bounded thread pool.
+    A pool size of 0 runs the work inline, which is only meant for benchmarking.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="hashing") if max_workers > 0 else None
+
+    async def run(self, func, *args):
+        if self.executor is None:
+            return func(*args)
+        if self.pending >= self.max_pending:
+            raise HashingPoolBusy("Too many password hashes in progress")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+hashing_pool = HashingPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
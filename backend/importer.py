@@ -0,0 +1,376 @@
+"""
+Bulk import of users, courts, reservations and tasks from CSV or JSONL.
+
+    python -m backend.importer users users.csv
+    python -m backend.importer reservations bookings.jsonl --report problems.csv
+    python -m backend.importer reservations bookings.csv --dry-run
+
+The input is streamed and handled in chunks: each chunk is validated, checked
+for duplicates and booking conflicts, and the accepted rows are inserted with
+a single executemany in their own transaction. Rejected rows are reported with
+their line number and do not stop the import.
+
+Columns (CSV header or JSON keys; empty CSV cells count as missing):
+
+    users         username, email, phonenumber, avatar_url, password or hashed_password, role, is_active
+    courts        court_name, court_type, description, capacity, hourly_rate, is_available, images
+    reservations  start_date_time, end_date_time, court_id, reservor_id or reservor_email, rate, status
+    tasks         title, description, due_date, status, assigned_to or assignee_email
+
+The API keeps an in-memory index of reservations and caches users and
+courts, so restart it after importing. The dashboard aggregates are rebuilt
+at the end of the import.
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from sqlalchemy import insert, select
+
+from . import aggregates, crud, models
+from .database import Base, engine
+from .hashing import HASH_POOL_SIZE
+from .occupancy import Booking, CourtSchedule, normalize, slot_bounds, slot_rows
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_RATE = models.Reservation.__table__.c.rate.default.arg
+
+
+class UserImport(BaseModel):
+    username: str
+    email: str
+    phonenumber: str
+    avatar_url: str = ""
+    password: Optional[str] = None
+    hashed_password: Optional[str] = None
+    role: models.RoleEnum = models.RoleEnum.CUSTOMER
+    is_active: bool = True
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if self.password is None and self.hashed_password is None:
+            raise ValueError("password or hashed_password is required")
+        return self
+
+
+class CourtImport(BaseModel):
+    court_name: str
+    court_type: str
+    description: str = ""
+    capacity: Optional[int] = None
+    hourly_rate: Decimal
+    is_available: bool = True
+    images: Optional[List[str]] = None
+
+    @field_validator("images", mode="before")
+    @classmethod
+    def parse_images(cls, value):
+        # CSV cells carry the list as JSON
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class ReservationImport(BaseModel):
+    start_date_time: datetime
+    end_date_time: datetime
+    court_id: int
+    reservor_id: Optional[int] = None
+    reservor_email: Optional[str] = None
+    rate: Optional[int] = None
+    status: str = "Pending"
+
+    @model_validator(mode="after")
+    def check_reservation(self):
+        if self.reservor_id is None and self.reservor_email is None:
+            raise ValueError("reservor_id or reservor_email is required")
+        # Stored naive, like the reservations the API creates
+        self.start_date_time = normalize(self.start_date_time)
+        self.end_date_time = normalize(self.end_date_time)
+        if self.end_date_time <= self.start_date_time:
+            raise ValueError("reservation must end after it starts")
+        return self
+
+
+class TaskImport(BaseModel):
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    status: models.TaskStatus = models.TaskStatus.PENDING
+    assigned_to: Optional[int] = None
+    assignee_email: Optional[str] = None
+
+
+class ImportReport:
+    """Counts per outcome plus the rejected rows, optionally written to a CSV report."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.counts = {"read": 0, "inserted": 0, "invalid": 0, "duplicate": 0, "conflict": 0}
+        self.file = open(path, "w", newline="") if path else None
+        self.writer = csv.writer(self.file) if self.file else None
+        if self.writer:
+            self.writer.writerow(["line", "outcome", "reason"])
+        self.shown = 0
+
+    def reject(self, line: int, outcome: str, reason: str):
+        self.counts[outcome] += 1
+        if self.writer:
+            self.writer.writerow([line, outcome, reason])
+        elif self.shown < 50:
+            self.shown += 1
+            print(f"line {line}: {outcome}: {reason}", file=sys.stderr)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, row) from a CSV or JSONL file without loading it whole."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as file:
+        if fmt == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            for line, text in enumerate(file, start=1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except ValueError as error:
+                        yield line, {"__error__": f"invalid JSON: {error}"}
+
+
+def validation_reason(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+class Importer:
+    """Shared chunking and validation; subclasses check and shape the rows of one table."""
+
+    model = None
+    table = None
+
+    def __init__(self, connection, report: ImportReport, dry_run: bool = False):
+        self.connection = connection
+        self.report = report
+        self.dry_run = dry_run
+
+    def load(self):
+        """Read whatever existing rows the duplicate and conflict checks need."""
+
+    def accept(self, line: int, row) -> Optional[dict]:
+        """Return the values to insert for a validated row, or None after reporting it."""
+        raise NotImplementedError
+
+    def prepare(self, values: List[dict]) -> List[dict]:
+        return values
+
+    def write(self, values: List[dict]):
+        self.connection.execute(insert(self.table), values)
+
+    def run(self, rows: Iterator[Tuple[int, dict]], batch_size: int):
+        self.load()
+        self.connection.commit()
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            values = []
+            for line, raw in chunk:
+                self.report.counts["read"] += 1
+                if "__error__" in raw:
+                    self.report.reject(line, "invalid", raw["__error__"])
+                    continue
+                try:
+                    row = self.model.model_validate(raw)
+                except ValidationError as error:
+                    self.report.reject(line, "invalid", validation_reason(error))
+                    continue
+                accepted = self.accept(line, row)
+                if accepted is not None:
+                    values.append(accepted)
+            if values and not self.dry_run:
+                self.write(self.prepare(values))
+                self.connection.commit()
+            self.report.counts["inserted"] += len(values)
+
+
+class UserImporter(Importer):
+    model = UserImport
+    table = models.User
+
+    def load(self):
+        self.usernames = set(self.connection.execute(select(models.User.username)).scalars())
+        self.emails = set(self.connection.execute(select(models.User.email)).scalars())
+        self.executor = ThreadPoolExecutor(max(1, HASH_POOL_SIZE), thread_name_prefix="import-hashing")
+
+    def accept(self, line: int, row: UserImport):
+        if row.email in self.emails:
+            self.report.reject(line, "duplicate", f"email {row.email} already exists")
+            return None
+        if row.username in self.usernames:
+            self.report.reject(line, "duplicate", f"username {row.username} already exists")
+            return None
+        self.emails.add(row.email)
+        self.usernames.add(row.username)
+        return row.model_dump()
+
+    def prepare(self, values: List[dict]) -> List[dict]:
+        # PBKDF2 releases the GIL, so hash a chunk's plain passwords in parallel
+        pending = [value for value in values if value["hashed_password"] is None]
+        for value, hashed in zip(pending, self.executor.map(crud.hash_password, [v["password"] for v in pending])):
+            value["hashed_password"] = hashed
+        for value in values:
+            del value["password"]
+        return values
+
+
+class CourtImporter(Importer):
+    model = CourtImport
+    table = models.Court
+
+    def accept(self, line: int, row: CourtImport):
+        return row.model_dump()
+
+
+class ReservationImporter(Importer):
+    model = ReservationImport
+    table = models.Reservation
+
+    def load(self):
+        self.courts = set(self.connection.execute(select(models.Court.id)).scalars())
+        self.users = {email: user_id for email, user_id in self.connection.execute(select(models.User.email, models.User.id))}
+        self.user_ids = set(self.users.values())
+        self.schedules: Dict[int, CourtSchedule] = {}
+        # Rows accepted earlier in this import have no id yet, so reports name their line
+        self.lines: Dict[Tuple[int, datetime], int] = {}
+        result = self.connection.execute(
+            select(models.Reservation.court_id, models.Reservation.start_date_time, models.Reservation.end_date_time, models.Reservation.id)
+            .order_by(models.Reservation.court_id, models.Reservation.start_date_time)
+        )
+        for court_id, start, end, reservation_id in result:
+            if start is not None and end is not None:
+                self.schedules.setdefault(court_id, CourtSchedule()).add(Booking(start, end, reservation_id, None, None, court_id, None))
+
+    def accept(self, line: int, row: ReservationImport):
+        if row.court_id not in self.courts:
+            self.report.reject(line, "invalid", f"court {row.court_id} does not exist")
+            return None
+        reservor_id = row.reservor_id if row.reservor_id is not None else self.users.get(row.reservor_email)
+        if reservor_id not in self.user_ids:
+            self.report.reject(line, "invalid", f"reservor {row.reservor_id or row.reservor_email} does not exist")
+            return None
+        start, end = row.start_date_time, row.end_date_time
+        schedule = self.schedules.setdefault(row.court_id, CourtSchedule())
+        # Reservations sharing an hour would collide in reservation_slots, so compare whole slots
+        conflicts = schedule.overlapping(*slot_bounds(start, end))
+        if conflicts:
+            other = conflicts[0]
+            where = f"reservation {other.id}" if other.id is not None else f"line {self.lines[(other.court_id, other.start_date_time)]}"
+            outcome = "duplicate" if (other.start_date_time, other.end_date_time) == (start, end) else "conflict"
+            self.report.reject(line, outcome, f"court {row.court_id} {start:%Y-%m-%d %H:%M}-{end:%H:%M} overlaps {where}")
+            return None
+        rate = row.rate if row.rate is not None else DEFAULT_RATE
+        schedule.add(Booking(start, end, None, rate, reservor_id, row.court_id, row.status))
+        self.lines[(row.court_id, start)] = line
+        return {
+            "start_date_time": start,
+            "end_date_time": end,
+            "court_id": row.court_id,
+            "reservor_id": reservor_id,
+            "rate": rate,
+            "status": row.status,
+        }
+
+    def write(self, values: List[dict]):
+        ids = self.connection.execute(
+            insert(self.table).returning(self.table.id, sort_by_parameter_order=True), values
+        ).scalars().all()
+        self.connection.execute(insert(models.ReservationSlot), [
+            slot
+            for reservation_id, value in zip(ids, values)
+            for slot in slot_rows(reservation_id, value["court_id"], value["start_date_time"], value["end_date_time"])
+        ])
+
+
+class TaskImporter(Importer):
+    model = TaskImport
+    table = models.Task
+
+    def load(self):
+        self.users = {email: user_id for email, user_id in self.connection.execute(select(models.User.email, models.User.id))}
+        self.user_ids = set(self.users.values())
+
+    def accept(self, line: int, row: TaskImport):
+        assigned_to = row.assigned_to if row.assigned_to is not None else self.users.get(row.assignee_email)
+        if (row.assigned_to is not None or row.assignee_email is not None) and assigned_to not in self.user_ids:
+            self.report.reject(line, "invalid", f"assignee {row.assigned_to or row.assignee_email} does not exist")
+            return None
+        return {
+            "title": row.title,
+            "description": row.description,
+            "due_date": normalize(row.due_date) if row.due_date else None,
+            "status": row.status,
+            "assigned_to": assigned_to,
+            "created_at": datetime.utcnow(),
+        }
+
+
+IMPORTERS = {
+    "users": UserImporter,
+    "courts": CourtImporter,
+    "reservations": ReservationImporter,
+    "tasks": TaskImporter,
+}
+
+
+def run_import(kind: str, path: str, fmt: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+               dry_run: bool = False, report_path: Optional[str] = None) -> dict:
+    Base.metadata.create_all(bind=engine)
+    report = ImportReport(report_path)
+    try:
+        with engine.connect() as connection:
+            IMPORTERS[kind](connection, report, dry_run).run(read_rows(path, fmt), batch_size)
+    finally:
+        report.close()
+    if kind in ("users", "reservations") and report.counts["inserted"] and not dry_run:
+        asyncio.run(aggregates.run_reconcile(fix=True))
+    return report.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="validate and check only, insert nothing")
+    parser.add_argument("--report", help="write rejected rows to this CSV file instead of stderr")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = run_import(args.kind, args.path, args.format, args.batch_size, args.dry_run, args.report)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{counts['read']} rows read, {counts['inserted']} {'valid' if args.dry_run else 'inserted'}, "
+        f"{counts['duplicate']} duplicate, {counts['conflict']} conflicting, {counts['invalid']} invalid "
+        f"in {elapsed:.1f}s ({counts['read'] / max(elapsed, 1e-9):.0f} rows/s)"
+    )
+    rejected = counts["duplicate"] + counts["conflict"] + counts["invalid"]
+    raise SystemExit(1 if rejected else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,72 @@
-from fastapi import Depends, FastAPI, HTTPException, Query, Response, Cookie
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, Cookie
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import base64
+import calendar
 import jwt
-from sqlalchemy.orm import Session
-from . import crud, models, schemas
-from .database import SessionLocal, engine, Base
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import aggregates, crud, models, schemas
+from .database import AsyncSessionLocal, engine, Base, describe_engine
+from .hashing import hashing_pool, HashingPoolBusy
+from .occupancy import court_occupancy, normalize
+from .court_catalog import CatalogEntry, court_catalog, not_modified
+from .court_events import court_events
+from .coalescing import court_catalog_reads, day_bookings_reads, day_key
+from .principals import Principal, principal_cache, principal_from_user
+from .permissions import permission_mask, permissions_from_mask, role_permissions
+from . import metrics
+from .profiling import ProfilingMiddleware, profile_store
+from .revocation import STATELESS_AUTH, STATELESS_ACCESS_TOKEN_MINUTES, token_revocations
+from . import responses
 from dotenv import load_dotenv  # Import load_dotenv
+from pydantic import TypeAdapter
+import logging
 import os
 
 Base.metadata.create_all(bind=engine) # This line ensures that tables are created if they don’t exist
+# create_all skips indexes on tables that already exist, so add new ones explicitly
+for index in models.Reservation.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 load_dotenv()
 
-app = FastAPI()
+logger = logging.getLogger("uvicorn.error")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Database settings: %s", describe_engine(engine))
+    async with AsyncSessionLocal() as db:
+        await court_occupancy.load(db)  # Build the in-memory court schedules from reservations
+        skipped = await crud.ensure_reservation_slots(db)
+        if skipped:
+            logger.warning("%d reservation slots are double booked and were not claimed", skipped)
+        if await crud.ensure_default_permissions(db):
+            logger.info("Permissions table was empty; seeded the default role permissions")
+        await role_permissions.load(db)
+        await token_revocations.load(db)
+        await aggregates.ensure_initialized(db)
+    yield
+    hashing_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=responses.DEFAULT_RESPONSE_CLASS)
+
+@app.exception_handler(crud.SlotTaken)
+async def slot_taken_handler(request: Request, exc: crud.SlotTaken):
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Reservation already exists for this time slot"}
+    )
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again"},
+        headers={"Retry-After": "1"}
+    )
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,33 +79,155 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if responses.COMPRESSION_ENABLED:
+    app.add_middleware(responses.CompressionMiddleware)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "default_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week token expiration
+# In stateless mode the week-long token is a refresh token and access tokens are short-lived
+REFRESH_TOKEN_EXPIRE_MINUTES = ACCESS_TOKEN_EXPIRE_MINUTES
 
+# Serializers for the cached court catalog responses
+court_adapter = TypeAdapter(schemas.Court)
+court_list_adapter = TypeAdapter(list[schemas.Court])
+booking_list_adapter = TypeAdapter(list[schemas.Reservation])
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+def rows_response(request: Request, adapter: TypeAdapter, rows, headers: Optional[dict] = None) -> Response:
+    """
+    Serialize read-model rows with a precompiled adapter, skipping response_model
+    validation, as JSON or as MessagePack when the client asks for it.
+    """
+    media_type = responses.negotiate_media_type(request.headers.get("accept"))
+    return Response(
+        content=responses.encode(adapter, rows, media_type),
+        media_type=media_type,
+        headers={"Vary": "Accept", **(headers or {})},
+    )
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def create_access_token(data: dict):
+def create_access_token(data: dict, role: Optional[models.RoleEnum] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    if role is not None:
+        # Permission bitmask of the role, so checks need no lookup
+        to_encode.update(role_permissions.claims(role))
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
+def stateless_access_claims(principal: Principal) -> dict:
+    """Claims of a short-lived access token carrying everything get_current_user needs."""
+    issued_at = time.time()
+    return {
+        "sub": str(principal.id),
+        "typ": "access",
+        "iat": issued_at,
+        "exp": issued_at + STATELESS_ACCESS_TOKEN_MINUTES * 60,
+        "usr": principal.username,
+        "eml": principal.email,
+        "tel": principal.phonenumber,
+        "avt": principal.avatar_url,
+        "act": principal.is_active,
+        "role": principal.role.value,
+        **role_permissions.claims(principal.role),
+    }
+
+def create_refresh_token(user_id: int) -> str:
+    issued_at = time.time()
+    return jwt.encode({
+        "sub": str(user_id),
+        "typ": "refresh",
+        "iat": issued_at,
+        "exp": issued_at + REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+    }, SECRET_KEY, algorithm=ALGORITHM)
+
+def principal_from_claims(claims: dict) -> Principal:
+    try:
+        return Principal(
+            id=int(claims["sub"]),
+            username=claims["usr"],
+            email=claims["eml"],
+            phonenumber=claims["tel"],
+            avatar_url=claims["avt"],
+            is_active=claims["act"],
+            role=models.RoleEnum(claims["role"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials"
+        )
+
+def set_token_cookie(response: Response, key: str, value: str):
+    response.set_cookie(
+        key=key,
+        value=value,
+        httponly=True,
+        secure=False,  # Set to True in production with HTTPS
+        samesite="lax",
+        max_age=REFRESH_TOKEN_EXPIRE_MINUTES * 60,
+        path="/"
+    )
+
+async def refresh_access_token(refresh_token: str, response: Response) -> dict:
+    """Check the refresh token's user against the database and set a new access token cookie."""
+    try:
+        claims = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        if claims.get("typ") != "refresh":
+            raise jwt.InvalidTokenError("not a refresh token")
+        user_id = int(claims["sub"])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token has expired"
+        )
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials"
+        )
+
+    async with AsyncSessionLocal() as db:
+        user = await crud.get_user(db, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=401,
+            detail="User not found"
+        )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=401,
+            detail="Inactive user"
+        )
+
+    access_claims = stateless_access_claims(principal_from_user(user))
+    set_token_cookie(response, "token", jwt.encode(access_claims, SECRET_KEY, algorithm=ALGORITHM))
+    return access_claims
+
+async def get_token_claims(
+    response: Response,
     token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
-):
+    refresh_token: Optional[str] = Cookie(None)
+) -> dict:
+    # In stateless mode an expired or revoked access token is replaced transparently
+    can_refresh = STATELESS_AUTH and refresh_token is not None
+
     # Check if token exists
     if not token:
+        if can_refresh:
+            return await refresh_access_token(refresh_token, response)
         raise HTTPException(
             status_code=401,
             detail="Not authenticated"
@@ -59,16 +235,58 @@ async def get_current_user(
 
     try:
         # Decode and validate token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        if can_refresh:
+            return await refresh_access_token(refresh_token, response)
+        raise HTTPException(
+            status_code=401,
+            detail="Token has expired"
+        )
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials"
+        )
+
+    if claims.get("typ") == "refresh":
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials"
+        )
+    if claims.get("typ") == "access" and token_revocations.is_revoked(int(claims["sub"]), claims.get("iat")):
+        if can_refresh:
+            return await refresh_access_token(refresh_token, response)
+        raise HTTPException(
+            status_code=401,
+            detail="Token has been revoked"
+        )
+    return claims
+
+async def get_current_user(
+    claims: dict = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db)
+):
+    if STATELESS_AUTH and claims.get("typ") == "access":
+        # Signature and revocation were checked in get_token_claims, the claims are the user
+        user = principal_from_claims(claims)
+        if not user.is_active:
+            raise HTTPException(
+                status_code=401,
+                detail="Inactive user"
+            )
+        return user
+
+    try:
+        user_id: str = claims.get("sub")
         if user_id is None:
             raise HTTPException(
                 status_code=401,
                 detail="Invalid authentication token"
             )
         
-        # Get user from database
-        user = crud.get_user(db, user_id=int(user_id))
+        # Resolve the user, normally from the principal cache without a query
+        user = await crud.get_principal(db, user_id=int(user_id))
         if user is None:
             raise HTTPException(
                 status_code=401,
@@ -84,62 +302,90 @@ async def get_current_user(
 
         return user
 
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=401,
-            detail="Token has expired"
-        )
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=401,
-            detail="Could not validate credentials"
-        )
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(
             status_code=401, 
             detail="Could not validate credentials"
         )
 
+def holds_permissions(claims: dict, user: Principal, *permissions: models.PermissionEnum) -> bool:
+    """Whether `user`'s role holds every one of `permissions`, read from the token's bitmask."""
+    required = permission_mask(permissions)
+    return role_permissions.mask_from_claims(claims, user.role) & required == required
+
+def require_permissions(*permissions: models.PermissionEnum):
+    """
+    Dependency that returns the current user if their role holds every one of
+    `permissions`, checked against the token's bitmask without a database query.
+    """
+    async def check_permissions(
+        claims: dict = Depends(get_token_claims),
+        current_user: Principal = Depends(get_current_user)
+    ) -> Principal:
+        if not holds_permissions(claims, current_user, *permissions):
+            raise HTTPException(status_code=403, detail="Access denied")
+        return current_user
+
+    return check_permissions
+
+async def profiling_allowed(scope) -> bool:
+    """Only active managers may profile requests."""
+    token = Request(scope).cookies.get("token")
+    if not token:
+        return False
+    try:
+        user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+        async with AsyncSessionLocal() as db:
+            user = await crud.get_principal(db, user_id=int(user_id))
+    except (jwt.PyJWTError, TypeError, ValueError):
+        return False
+    return user is not None and user.is_active and user.role == models.RoleEnum.MANAGER
+
+app.add_middleware(ProfilingMiddleware, authorize=profiling_allowed)
+
 #  get all users
 @app.get("/api/users/", response_model=list[schemas.User])
 async def read_users(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # if not current_user or current_user.role != models.RoleEnum.MANAGER:
     #     raise HTTPException(status_code=403, detail="Access denied")
-    return crud.get_users(db)
+    return rows_response(request, schemas.user_rows_adapter, await crud.get_user_rows(db))
 
 @app.get("/api/users/{user_id}/current_reserves/", response_model=list[schemas.ReservationWithCourt])
 async def read_user_current_reserves(
     user_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
-    return crud.get_current_reserves_by_id(db, user_id=user_id)
+    return await crud.get_current_reserves_by_id(db, user_id=user_id)
 
 @app.get("/api/users/{user_id}/past_reserves/", response_model=list[schemas.ReservationWithCourt])
 async def read_user_past_reserves(
     user_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
-    return crud.get_past_reserves_by_id(db, user_id=user_id)
+    return await crud.get_past_reserves_by_id(db, user_id=user_id)
 
 
 @app.get("/api/reservations/{reservor_id}", response_model=list[schemas.Reservation])
 async def read_reservations_by_reservor_id(
     reservor_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
-    reservations = crud.get_reserves_by_id(db, user_id=reservor_id)
+    reservations = await crud.get_reserves_by_id(db, user_id=reservor_id)
     if not reservations:
         raise HTTPException(status_code=404, detail="No reservations found for the given reservor_id")
     return reservations
@@ -147,34 +393,35 @@ async def read_reservations_by_reservor_id(
 # TODO: not working rn
 @app.get("/users/{user_id}", response_model=schemas.User)
 async def get_user(user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = crud.get_user(db, user_id)
+    db_user = await crud.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @app.post("/api/login/")
-async def login(user: schemas.UserLogin, response: Response, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if not db_user or not crud.verify_password(user.password, db_user.hashed_password):
+async def login(user: schemas.UserLogin, response: Response, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_email(db, email=user.email)
+    if not db_user or not await crud.verify_password_async(user.password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Invalid email or password")
+
+    # Upgrade hashes made with an older work factor while we have the plain password
+    if crud.password_needs_rehash(db_user.hashed_password):
+        await crud.rehash_user_password(db, db_user, user.password)
     
-    # Create access token with longer expiration
-    access_token = create_access_token(
-        data={"sub": str(db_user.id)}
-    )
-    
-    # Set more robust cookie
-    response.set_cookie(
-        key="token",
-        value=access_token,
-        httponly=True,
-        secure=False,  # Set to True in production with HTTPS
-        samesite="lax",
-        max_age=60*60*24*7,  # 1 week
-        path="/"
-    )
+    if STATELESS_AUTH:
+        # Short-lived access token carrying the user, renewed with the refresh token
+        access_claims = stateless_access_claims(principal_from_user(db_user))
+        set_token_cookie(response, "token", jwt.encode(access_claims, SECRET_KEY, algorithm=ALGORITHM))
+        set_token_cookie(response, "refresh_token", create_refresh_token(db_user.id))
+    else:
+        # Create access token with longer expiration
+        access_token = create_access_token(
+            data={"sub": str(db_user.id)},
+            role=db_user.role
+        )
+        set_token_cookie(response, "token", access_token)
     
     return {
         "message": "Successfully logged in",
@@ -188,20 +435,34 @@ async def login(user: schemas.UserLogin, response: Response, db: Session = Depen
 @app.post("/api/logout/")
 async def logout(response: Response):
     response.delete_cookie(key="token", path="/")
+    response.delete_cookie(key="refresh_token", path="/")
     return {"message": "Successfully logged out"}
 
+@app.post("/api/token/refresh/")
+async def refresh_session(response: Response, refresh_token: Optional[str] = Cookie(None)):
+    if not refresh_token:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated"
+        )
+    await refresh_access_token(refresh_token, response)
+    return {"message": "Token refreshed"}
+
 @app.get("/api/current_user/")
 async def get_user_info(
-    current_user: models.User = Depends(get_current_user)
+    claims: dict = Depends(get_token_claims),
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user:
+        mask = role_permissions.mask_from_claims(claims, current_user.role)
         return {
             "id": current_user.id,
             "email": current_user.email,
             "username": current_user.username,
             "avatar_url": current_user.avatar_url,
             "role": current_user.role,
-            "is_active": current_user.is_active
+            "is_active": current_user.is_active,
+            "permissions": [permission.value for permission in permissions_from_mask(mask)]
         }
     else:
         return {}
@@ -231,39 +492,39 @@ async def test_jwt():
         raise HTTPException(status_code=500, detail="Failed to decode JWT - check your secret key")
 
 @app.post("/api/signup/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # First check if user with given email already exists
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
 @app.post("/api/signup/employee", response_model=schemas.User)
-def create_employee(user: schemas.EmployeeCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_employee(user: schemas.EmployeeCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    return crud.create_employee(db=db, user=user)
+    return await crud.create_employee(db=db, user=user)
 
 @app.post("/api/signup/manager", response_model=schemas.User)
 async def create_manager(
     user: schemas.ManagerCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        db_user = crud.get_user_by_email(db, email=user.email)
+        db_user = await crud.get_user_by_email(db, email=user.email)
         if db_user:
             raise HTTPException(
                 status_code=400,
                 detail="Email already registered"
             )
-        return crud.create_manager(db=db, user=user)
+        return await crud.create_manager(db=db, user=user)
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -272,35 +533,32 @@ async def create_manager(
 
 @app.get("/api/employees/all", response_model=list[schemas.EmployeeResponse])
 async def get_all_employees(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    employees = crud.get_all_employees(db)
-    if not employees:
-        return []
-    return employees
+    return rows_response(request, schemas.employee_rows_adapter, await crud.get_employee_rows(db))
 
 @app.get("/api/users/all", response_model=list[schemas.EmployeeResponse])
 async def get_all_employees(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    users = crud.get_all_employees(db)
+    users = await crud.get_all_employees(db)
     if not users:
         return []
     return users
 
 @app.get("/api/reserves_by_day/{court_id}", response_model=list[schemas.Reservation])
-def read_reserves_by_day(
+async def read_reserves_by_day(
     court_id: int,
-    date_time: str = Query(...),
-    db: Session = Depends(get_db)
+    date_time: str = Query(...)
 ):
     """
     Get all reservations for specific court on the given day
@@ -309,65 +567,157 @@ def read_reserves_by_day(
         parsed_date = datetime.fromisoformat(date_time.replace('Z', '+00:00'))
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
-    
-    # Verify court exists
-    court = crud.get_court_by_id(db, court_id)
+
+    day_start = crud.day_bounds(parsed_date)[0]
+
+    async def render_day() -> Optional[bytes]:
+        async with AsyncSessionLocal() as db:
+            # Verify court exists
+            court = await crud.get_court_by_id(db, court_id)
+            if not court:
+                return None
+            reservations = await crud.get_day_bookings(db, court_id=court_id, start_date_time=day_start)
+        return booking_list_adapter.dump_json(booking_list_adapter.validate_python(reservations, from_attributes=True))
+
+    # Identical requests in flight share one lookup and one serialized body
+    body = await day_bookings_reads.run(day_key(court_id, day_start), render_day)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Court not found")
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/reserves_by_day/{court_id}/events")
+async def watch_reserves_by_day(
+    court_id: int,
+    date_time: str = Query(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Server-sent events for a court-day: a snapshot of its reservations, then
+    slot-taken and slot-freed events as bookings are created and deleted
+    """
+    try:
+        parsed_date = datetime.fromisoformat(date_time.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+
+    court = await crud.get_court_by_id(db, court_id)
     if not court:
         raise HTTPException(status_code=404, detail="Court not found")
-    
-    reservations = crud.get_reserves_by_day(db, court_id=court_id, start_date_time=parsed_date)
-    return reservations
+
+    await court_occupancy.ensure_loaded(db)
+    day_start, day_end = crud.day_bounds(parsed_date)
+    return StreamingResponse(
+        court_events.stream(court_id, day_start, day_end),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+MAX_SEARCH_RANGE = timedelta(days=31)
+
+@app.get("/api/availability/search", response_model=list[schemas.FreeWindow])
+async def search_availability(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    duration: int = Query(1, ge=1, le=24, description="Length of the window in hours"),
+    court_type: Optional[str] = None,
+    min_capacity: Optional[int] = None,
+    limit: int = Query(200, ge=1, le=2000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Free hour-aligned windows across every matching court, sorted by start time and price
+    """
+    start, end = normalize(start), normalize(end)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    if end - start > MAX_SEARCH_RANGE:
+        raise HTTPException(status_code=400, detail="Search range is limited to 31 days")
+    return await crud.search_availability(
+        db, start=start, end=end, duration=duration,
+        court_type=court_type, min_capacity=min_capacity, limit=limit
+    )
 
 @app.get("/api/all-reserves/", response_model=list[schemas.ReservationWithCourt])
-def read_all_reserves(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def read_all_reserves(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    court_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all reservations (manager only)
+    Get all reservations (manager only), ordered by start time.
+
+    With `limit` or `cursor`, returns one page per call (100 rows unless `limit`
+    says otherwise); pass the X-Next-Cursor response header back as `cursor` for
+    the next page. Without either it returns every matching reservation, as the
+    frontend views expect. format=ndjson streams every matching reservation.
     """
     # if not current_user or current_user.role != models.RoleEnum.MANAGER:
     #     raise HTTPException(status_code=403, detail="Access denied")
-    return crud.get_all_reserves(db)
+    filters = dict(court_id=court_id, user_id=user_id, status=status, start=start, end=end)
+
+    if format == "ndjson":
+        async def generate():
+            # The request session closes before streaming starts, so use our own
+            async with AsyncSessionLocal() as stream_db:
+                async for row in crud.stream_reserves(stream_db, **filters):
+                    yield schemas.reservation_row_adapter.dump_json(row) + b"\n"
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    if limit is None and cursor is None:
+        return rows_response(request, schemas.reservation_rows_adapter, await crud.get_reserve_rows(db, **filters))
+
+    try:
+        rows, next_cursor = await crud.get_reserve_rows_page(db, limit=limit or 100, cursor=cursor, **filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return rows_response(request, schemas.reservation_rows_adapter, rows, {"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @app.get("/api/reserves_current_user/", response_model=list[schemas.Reservation])
-def read_reserves(current_user: int = Depends(get_current_user), db: Session = Depends(get_db)):
+async def read_reserves(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     
     """
     Get all reservations for the currently logged in user
     """
-    reservations = crud.get_reserves_by_id(db, user_id=current_user.id)
+    reservations = await crud.get_reserves_by_id(db, user_id=current_user.id)
     return reservations
 
 
 @app.get("/api/current_reserves/", response_model=list[schemas.ReservationWithCourt])
-def read_current_reserves(current_user: int = Depends(get_current_user), db: Session = Depends(get_db)):
+async def read_current_reserves(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """
     Get all current and future reservations for the logged in user
     """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    reservations = crud.get_current_reserves_by_id(db, user_id=current_user.id)
+    reservations = await crud.get_current_reserves_by_id(db, user_id=current_user.id)
     return reservations
 
 @app.get("/api/past_reserves/", response_model=list[schemas.ReservationWithCourt])
-def read_past_reserves(current_user: int = Depends(get_current_user), db: Session = Depends(get_db)):
+async def read_past_reserves(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """
     Get all past reservations for the logged in user
     """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    reservations = crud.get_past_reserves_by_id(db, user_id=current_user.id)
+    reservations = await crud.get_past_reserves_by_id(db, user_id=current_user.id)
     return reservations
 
 @app.get("/api/check_reserves/", response_model=list[schemas.Reservation])
-def check_reserves(date_time: str = Query(...), db: Session = Depends(get_db)):
+async def check_reserves(date_time: str = Query(...), db: AsyncSession = Depends(get_db)):
     try:
         parsed_date = datetime.fromisoformat(date_time.replace('Z', '+00:00'))
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
     
-    reserves = crud.get_check_reserves(db, start_date_time=parsed_date)
+    reserves = await crud.get_check_reserves(db, start_date_time=parsed_date)
     if not reserves:
         raise HTTPException(status_code=404, detail="No reservations found for the given date and time")
     return reserves
@@ -375,36 +725,99 @@ def check_reserves(date_time: str = Query(...), db: Session = Depends(get_db)):
 @app.post("/api/create_reservation/", response_model=schemas.Reservation)
 async def create_reservation_for_user(
     reservation: schemas.ReservationCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if court exists
-    court = crud.get_court_by_id(db, court_id=reservation.court_id)
+    court = await crud.get_court_by_id(db, court_id=reservation.court_id)
     if not court:
         raise HTTPException(status_code=404, detail="Court not found")
 
-    # Check for existing reservations
-    same_reserves = crud.get_check_reserves(
-        db=db, 
+    # Bookings are stored naive, so aware bounds are compared with their timezone dropped
+    reservation = reservation.model_copy(update={
+        "start_date_time": normalize(reservation.start_date_time),
+        "end_date_time": normalize(reservation.end_date_time),
+    })
+    if reservation.end_date_time <= reservation.start_date_time:
+        raise HTTPException(status_code=400, detail="Reservation must end after it starts")
+
+    # Check for reservations overlapping the requested time range
+    same_reserves = await crud.get_conflicting_reserves(
+        db=db,
         court_id=reservation.court_id,
-        start_date_time=reservation.start_date_time
+        start_date_time=reservation.start_date_time,
+        end_date_time=reservation.end_date_time
     )
     if same_reserves:
         raise HTTPException(
-            status_code=400, 
+            status_code=409,
             detail="Reservation already exists for this time slot"
         )
     
-    return crud.create_user_reservation(
+    return await crud.create_user_reservation(
         db=db, 
         reservation=reservation, 
         user_id=current_user.id
     )
 
+MAX_RECURRING_OCCURRENCES = 366
+
+@app.post("/api/create_reservation/recurring", response_model=schemas.RecurringReservationResult)
+async def create_recurring_reservation(
+    rule: schemas.RecurringReservationCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Book a daily or weekly slot up to `until`, skipping `skip_dates`.
+    Free occurrences are booked and the rest are reported per occurrence.
+    """
+    court = await crud.get_court_by_id(db, court_id=rule.court_id)
+    if not court:
+        raise HTTPException(status_code=404, detail="Court not found")
+
+    # Bookings are stored naive, so aware bounds are compared with their timezone dropped
+    rule = rule.model_copy(update={
+        "start_date_time": normalize(rule.start_date_time),
+        "end_date_time": normalize(rule.end_date_time),
+    })
+    if rule.end_date_time <= rule.start_date_time:
+        raise HTTPException(status_code=400, detail="Reservation must end after it starts")
+    if rule.end_date_time - rule.start_date_time > crud.RECURRENCE_STEPS[rule.frequency]:
+        raise HTTPException(status_code=400, detail="Reservation is longer than the recurrence interval")
+
+    try:
+        occurrences = crud.expand_recurrence(rule, limit=MAX_RECURRING_OCCURRENCES)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Reservation dates are out of range")
+    if not occurrences:
+        raise HTTPException(status_code=400, detail="No occurrences before the until date")
+    if len(occurrences) > MAX_RECURRING_OCCURRENCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_RECURRING_OCCURRENCES} occurrences can be booked at once"
+        )
+
+    try:
+        return await crud.create_recurring_reservations(db, rule=rule, user_id=current_user.id)
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Reservation dates are out of range")
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """Send a cached court catalog body, or 304 when the client's copy is current."""
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": "private, no-cache",
+    }
+    if not_modified(entry, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @app.get("/api/courts/", response_model=list[schemas.Court])
 async def get_courts(
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: Principal = Depends(get_current_user), 
     available: Optional[bool] = None
 ):
     """
@@ -413,24 +826,29 @@ async def get_courts(
     if not current_user:
         raise HTTPException(status_code=403, detail="Not authenticated")
     
-    query = db.query(models.Court)
-    
-    # Optional availability filter
-    if available is not None:
-        query = query.filter(models.Court.is_available == available)
-    
-    return query.all()
+    key = f"list:{available}"
+    entry = court_catalog.get(key)
+    if entry is None:
+        async def render_courts() -> CatalogEntry:
+            version = court_catalog.current_version()
+            async with AsyncSessionLocal() as db:
+                courts = await crud.get_courts(db, available=available)
+            return court_catalog.put(key, version, court_list_adapter.dump_json(court_list_adapter.validate_python(courts, from_attributes=True)))
+
+        # After the catalog changes, the first misses share one query
+        entry = await court_catalog_reads.run(key, render_courts)
+    return catalog_response(request, entry)
 
 @app.delete("/api/users/{user_id}")
 async def delete_user(
     user_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    if crud.delete_user(db, user_id):
+    if await crud.delete_user(db, user_id):
         return {"message": "User deleted successfully"}
     raise HTTPException(status_code=404, detail="User not found")
 
@@ -438,13 +856,13 @@ async def delete_user(
 async def update_user(
     user_id: int,
     user_data: schemas.UserUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    user = crud.update_user(db, user_id, user_data)
+    user = await crud.update_user(db, user_id, user_data)
     if user:
         return user
     raise HTTPException(status_code=404, detail="User not found")
@@ -452,37 +870,37 @@ async def update_user(
 @app.get("/api/employees/tasks/{employee_id}")
 async def get_employee_tasks(
     employee_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return crud.get_employee_tasks_by_id(db, employee_id)
+    return await crud.get_employee_tasks_by_id(db, employee_id)
 
 @app.post("/api/employees/{employee_id}/tasks")
 async def assign_task(
     employee_id: int,
     task: schemas.TaskCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return crud.assign_task(db=db, task=task, employee_id=employee_id)
+    return await crud.assign_task(db=db, task=task, employee_id=employee_id)
 
 @app.put("/api/tasks/{task_id}", response_model=schemas.Task)
 async def update_task(
     task_id: int,
     task_data: schemas.TaskUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    task = crud.update_task(db, task_id, task_data.model_dump(exclude_unset=True))
+    task = await crud.update_task(db, task_id, task_data.model_dump(exclude_unset=True))
     if task:
         return task
     raise HTTPException(status_code=404, detail="Task not found")
@@ -491,83 +909,101 @@ async def update_task(
 @app.get("/api/employees/{employee_id}/tasks", response_model=list[schemas.Task])
 async def get_employee_tasks(
     employee_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.id != employee_id and current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_employee_tasks(db, employee_id=employee_id)
+    return await crud.get_employee_tasks(db, employee_id=employee_id)
 
 @app.put("/api/tasks/{task_id}", response_model=schemas.Task)
 async def update_task_status(
     task_id: int,
     task_update: schemas.TaskUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    task = crud.get_task(db, task_id)
+    task = await crud.get_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     if task.assigned_to != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.update_task(db, task_id, task_update)
+    return await crud.update_task(db, task_id, task_update)
 
 
 @app.get("/api/tasks/all", response_model=list[schemas.TaskWithEmployee])
 async def get_all_tasks(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    tasks = crud.get_all_tasks(db)
-    if not tasks:
-        return []
-        
-    print(f"Retrieved {len(tasks)} tasks") # Debug log
-    return [task for task in tasks]
+    return rows_response(request, schemas.task_rows_adapter, await crud.get_task_rows(db))
 
 
-@app.get("/api/courts/{court_id}", response_model=schemas.Court)
-async def get_court_details(
-    court_id: int,
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+# Registered before /api/courts/{court_id}, which would otherwise claim the path
+@app.get("/api/courts/occupancy", response_model=schemas.MonthOccupancy)
+async def get_courts_occupancy(
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    encoding: str = Query("int", pattern="^(int|base64)$"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get specific court details
+    Booked hours per court and day of `month` (YYYY-MM, default: this month),
+    one 24-bit bitmap per day, for the month view
     """
-    if not current_user:
-        raise HTTPException(status_code=403, detail="Not authenticated")
-    
-    court = db.query(models.Court).filter(models.Court.id == court_id).first()
-    if not court:
-        raise HTTPException(status_code=404, detail="Court not found")
-    
-    return court
+    if current_user.role not in [models.RoleEnum.MANAGER, models.RoleEnum.EMPLOYEE]:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    try:
+        month_start = datetime.strptime(month, "%Y-%m") if month else datetime.now().replace(day=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month")
+    month_start = month_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = calendar.monthrange(month_start.year, month_start.month)[1]
+
+    courts = await crud.get_month_occupancy(db, month_start=month_start, days=days)
+    if encoding == "base64":
+        for court in courts:
+            court["hours"] = base64.b64encode(b"".join(bitmap.to_bytes(3, "little") for bitmap in court["hours"])).decode()
+    return {"month": f"{month_start:%Y-%m}", "days": days, "encoding": encoding, "courts": courts}
 
 @app.get("/api/courts/{court_id}", response_model=schemas.Court)
 async def get_court_details(
     court_id: int,
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Get specific court details"""
+    """
+    Get specific court details
+    """
     if not current_user:
         raise HTTPException(status_code=403, detail="Not authenticated")
     
-    court = crud.get_court_by_id(db, court_id=court_id)
-    if not court:
-        raise HTTPException(status_code=404, detail="Court not found")
-    
-    return court
+    key = f"court:{court_id}"
+    entry = court_catalog.get(key)
+    if entry is None:
+        async def render_court() -> Optional[CatalogEntry]:
+            version = court_catalog.current_version()
+            async with AsyncSessionLocal() as db:
+                court = await crud.get_court_by_id(db, court_id=court_id)
+            if not court:
+                return None
+            return court_catalog.put(key, version, court_adapter.dump_json(court_adapter.validate_python(court, from_attributes=True)))
+
+        entry = await court_catalog_reads.run(key, render_court)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Court not found")
+    return catalog_response(request, entry)
 
 # @app.post("/api/create_court/", response_model=schemas.Court)
 # async def create_court(
 #     court: schemas.CourtBase,
-#     current_user: models.User = Depends(get_current_user), 
-#     db: Session = Depends(get_db)
+#     current_user: Principal = Depends(get_current_user), 
+#     db: AsyncSession = Depends(get_db)
 # ):
 #     if not current_user or current_user.role not in [models.RoleEnum.MANAGER, models.RoleEnum.EMPLOYEE]:
 #         raise HTTPException(status_code=403, detail="Access denied")
@@ -587,69 +1023,157 @@ async def get_court_details(
 @app.post("/api/courts/", response_model=schemas.Court)
 async def create_court(
     court: schemas.CourtCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.create_court(db=db, court=court)
+    return await crud.create_court(db=db, court=court)
 
 @app.get("/api/dashboard")
 async def get_dashboard(
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    claims: dict = Depends(get_token_claims),
+    current_user: Principal = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user:
         raise HTTPException(status_code=403, detail="Not authenticated")
 
+    # Staff dashboards show revenue
+    if current_user.role in [models.RoleEnum.MANAGER, models.RoleEnum.EMPLOYEE] and not holds_permissions(
+        claims, current_user, models.PermissionEnum.MONETARY_DASHBOARD
+    ):
+        raise HTTPException(status_code=403, detail="Access denied")
+
     # Role-based dashboard responses
     if current_user.role == models.RoleEnum.MANAGER:
         # MANAGER gets full dashboard with all statistics
-        return {
-            "totalUsers": crud.get_total_users_count(db),
-            "activeUsers": crud.get_active_users_count(db),
-            "totalReservations": crud.get_total_reservations_count(db),
-            "monthReservations": crud.get_month_reservations_count(db),
-            "totalRevenue": crud.calculate_total_revenue(db),
-            "monthRevenue": crud.calculate_month_revenue(db),
-            "reservationTrends": crud.get_reservation_trends(db)
-        }
+        return await crud.get_dashboard_summary(db)
     
     elif current_user.role == models.RoleEnum.EMPLOYEE:
         # Employee gets limited dashboard
+        summary = await crud.get_dashboard_summary(db)
         return {
-            "monthReservations": crud.get_month_reservations_count(db),
-            "monthRevenue": crud.calculate_month_revenue(db),
-            "reservationTrends": crud.get_reservation_trends(db)
+            "monthReservations": summary["monthReservations"],
+            "monthRevenue": summary["monthRevenue"],
+            "reservationTrends": summary["reservationTrends"]
         }
     
     elif current_user.role == models.RoleEnum.CUSTOMER:
         # Customer gets personal dashboard
         return {
-            "userReservations": crud.get_reserves_by_id(db, user_id=current_user.id),
-            "totalReservations": len(crud.get_reserves_by_id(db, user_id=current_user.id))
+            "userReservations": await crud.get_reserves_by_id(db, user_id=current_user.id),
+            "totalReservations": len(await crud.get_reserves_by_id(db, user_id=current_user.id))
         }
     
     raise HTTPException(status_code=403, detail="Access denied")
 
 
+@app.get("/api/reservation_trends")
+async def get_reservation_trends(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = Query("month", pattern="^(year|month|day|hour)$"),
+    court_id: Optional[int] = None,
+    current_user: Principal = Depends(require_permissions(models.PermissionEnum.MONETARY_DASHBOARD)),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reservation count and revenue per period between start and end (default: the last year)
+    """
+
+    # Bookings are stored naive, so aware bounds are compared with their timezone dropped
+    end = normalize(end) if end else datetime.now()
+    start = normalize(start) if start else end - timedelta(days=365)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await crud.get_reservation_trends(db, start=start, end=end, granularity=granularity, court_id=court_id)
+
 @app.get("/api/permissions/{role}", response_model=schemas.PermissionResponse)
 async def get_permissions_by_role(
+    role: models.RoleEnum
+):
+    return {"permissions": [permission.value for permission in role_permissions.permissions(role)]}
+
+@app.put("/api/permissions/{role}", response_model=schemas.PermissionResponse)
+async def set_permissions_by_role(
     role: models.RoleEnum,
-    db: Session = Depends(get_db)
+    update: schemas.PermissionUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_permissions_by_role(db, role)
+    if current_user.role != models.RoleEnum.MANAGER:
+        raise HTTPException(status_code=403, detail="Access denied")
+    await crud.set_permissions_by_role(db, role, update.permissions)
+    return {"permissions": [permission.value for permission in role_permissions.permissions(role)]}
 
 @app.delete("/api/reservations/{reservation_id}")
 async def delete_reservation(
     reservation_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user or current_user.role != models.RoleEnum.MANAGER:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    if crud.delete_reservation(db, reservation_id):
+    if await crud.delete_reservation(db, reservation_id):
         return {"message": "Reservation deleted successfully"}
     raise HTTPException(status_code=404, detail="Reservation not found")
 
+@app.get("/api/_debug/caches")
+async def get_cache_stats(
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role != models.RoleEnum.MANAGER:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return {
+        "principals": principal_cache.stats(),
+        "court_catalog": court_catalog.stats(),
+        "court_events": court_events.stats(),
+        "day_bookings_reads": day_bookings_reads.stats(),
+        "court_catalog_reads": court_catalog_reads.stats()
+    }
+
+@app.get("/api/_debug/database")
+async def get_database_settings(
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role != models.RoleEnum.MANAGER:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return describe_engine(engine)
+
+@app.get("/api/_debug/profiles")
+async def list_profiles(
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stored request profiles, newest first. Profile a request by sending it with
+    an `X-Profile: 1` header or `_profile=1` query parameter.
+    """
+    if current_user.role != models.RoleEnum.MANAGER:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return profile_store.list()
+
+@app.get("/api/_debug/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|pstats)$"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """A stored profile: the JSON summary with SQL, or the raw pstats file (format=pstats)."""
+    if current_user.role != models.RoleEnum.MANAGER:
+        raise HTTPException(status_code=403, detail="Access denied")
+    path = profile_store.path(profile_id, "json" if format == "json" else "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    return FileResponse(path, media_type="application/json")
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request and SQL metrics per route template, in Prometheus text format."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/{full_path:path}")
 async def serve_react(full_path: str):
     if full_path.startswith("api"):
@@ -0,0 +1,189 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+MetricsMiddleware times every request and labels it with the route template
+(e.g. /api/courts/{court_id}), so path parameters don't explode the series
+count. SQL statements are counted by cursor execute events on the engine and
+charged to the request running in the current context.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestCost:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+current_cost: ContextVar[Optional[RequestCost]] = ContextVar("current_cost", default=None)
+
+
+class RouteStats:
+    __slots__ = ("buckets", "count", "seconds", "statuses", "statements", "sql_seconds")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.background_statements = 0
+        self.background_sql_seconds = 0.0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, cost: RequestCost):
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self.lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.buckets[bucket] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.statements += cost.statements
+            stats.sql_seconds += cost.sql_seconds
+
+    def observe_background_sql(self, seconds: float):
+        with self.lock:
+            self.background_statements += 1
+            self.background_sql_seconds += seconds
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+            self.background_statements = 0
+            self.background_sql_seconds = 0.0
+
+    def render(self) -> str:
+        """The registry in Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            background = (self.background_statements, self.background_sql_seconds)
+            lines = [
+                "# HELP futsala_http_requests_total Requests handled, by route template and status.",
+                "# TYPE futsala_http_requests_total counter",
+            ]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'futsala_http_requests_total{{{labels(method, route)},status="{status}"}} {count}')
+
+            lines += [
+                "# HELP futsala_http_request_duration_seconds Request latency, by route template.",
+                "# TYPE futsala_http_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in routes:
+                route_labels = labels(method, route)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += count
+                    lines.append(f'futsala_http_request_duration_seconds_bucket{{{route_labels},le="{bound}"}} {cumulative}')
+                lines.append(f"futsala_http_request_duration_seconds_sum{{{route_labels}}} {stats.seconds:.6f}")
+                lines.append(f"futsala_http_request_duration_seconds_count{{{route_labels}}} {stats.count}")
+
+            lines += [
+                "# HELP futsala_db_statements_total SQL statements executed, by route template.",
+                "# TYPE futsala_db_statements_total counter",
+            ]
+            for (method, route), stats in routes:
+                lines.append(f"futsala_db_statements_total{{{labels(method, route)}}} {stats.statements}")
+            lines.append(f'futsala_db_statements_total{{method="",route="<background>"}} {background[0]}')
+
+            lines += [
+                "# HELP futsala_db_seconds_total Time spent executing SQL statements, by route template.",
+                "# TYPE futsala_db_seconds_total counter",
+            ]
+            for (method, route), stats in routes:
+                lines.append(f"futsala_db_seconds_total{{{labels(method, route)}}} {stats.sql_seconds:.6f}")
+            lines.append(f'futsala_db_seconds_total{{method="",route="<background>"}} {background[1]:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(sync_engine):
+    """Charge every SQL statement run on `sync_engine` to the current request."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        elapsed = time.perf_counter() - started
+        cost = current_cost.get()
+        if cost is None:
+            registry.observe_background_sql(elapsed)
+        else:
+            cost.statements += 1
+            cost.sql_seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def discard_timer(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("metrics_started"):
+            context.connection.info["metrics_started"].pop()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        cost = RequestCost()
+        token = current_cost.set(cost)
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_cost.reset(token)
+            route = scope.get("route")
+            registry.observe(
+                scope["method"],
+                getattr(route, "path_format", None) or UNMATCHED_ROUTE,
+                status,
+                time.perf_counter() - started,
+                cost,
+            )
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Enum, Numeric, Date, Time, UniqueConstraint, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Enum, Numeric, Date, Time, UniqueConstraint, JSON, Index, Float
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -48,6 +48,10 @@ class Court(Base):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Availability lookups filter by court and a start_date_time range
+        Index("ix_reservations_court_start", "court_id", "start_date_time"),
+    )
     
     id = Column(Integer, primary_key=True)
     start_date_time = Column(DateTime, index=True)
@@ -57,8 +61,10 @@ class Reservation(Base):
     court_id = Column(Integer, ForeignKey("courts.id"), nullable=True)
     status = Column(String, default="Pending")
     
-    reservor = relationship("User", back_populates="reserves")
-    court = relationship("Court", back_populates="reservations")
+    # Loading these must be planned in the query (see crud.with_court_and_reservor);
+    # raising instead of lazy loading keeps serializers from issuing a query per row
+    reservor = relationship("User", back_populates="reserves", lazy="raise_on_sql")
+    court = relationship("Court", back_populates="reservations", lazy="raise_on_sql")
 
 class TaskStatus(enum.Enum):
     PENDING = "pending"
@@ -75,7 +81,7 @@ class Task(Base):
     status = Column(Enum(TaskStatus), default=TaskStatus.PENDING)
     assigned_to = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
-    user = relationship("User", back_populates="tasks")
+    user = relationship("User", back_populates="tasks", lazy="raise_on_sql")
 
 class PermissionEnum(enum.Enum):
     MONETARY_DASHBOARD = "monetary-dashboard"
@@ -90,4 +96,58 @@ class Permission(Base):
 
     id = Column(Integer, primary_key=True)
     role = Column(Enum(RoleEnum), nullable=False)
-    permission = Column(Enum(PermissionEnum), nullable=False)
\ No newline at end of file
+    permission = Column(Enum(PermissionEnum), nullable=False)
+
+class DashboardTotals(Base):
+    """Running totals behind the manager dashboard, kept as a single row with id 1."""
+    __tablename__ = "dashboard_totals"
+
+    id = Column(Integer, primary_key=True)
+    total_users = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    total_reservations = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Integer, nullable=False, default=0)
+
+class DashboardMonth(Base):
+    """Reservation count and revenue per calendar month of start_date_time."""
+    __tablename__ = "dashboard_months"
+
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    reservations = Column(Integer, nullable=False, default=0)
+    revenue = Column(Integer, nullable=False, default=0)
+
+class ReservationRollup(Base):
+    """Reservation count and revenue per court and starting hour, used for trend analytics."""
+    __tablename__ = "reservation_rollups"
+    __table_args__ = (
+        UniqueConstraint("hour_start", "court_id", name="uq_reservation_rollups_hour_court"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    hour_start = Column(DateTime, nullable=False)
+    court_id = Column(Integer, ForeignKey("courts.id"), nullable=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    day = Column(Integer, nullable=False)
+    hour = Column(Integer, nullable=False)
+    reservations = Column(Integer, nullable=False, default=0)
+    revenue = Column(Integer, nullable=False, default=0)
+
+class TokenRevocation(Base):
+    """Access tokens of `user_id` issued at or before `revoked_at` (epoch seconds) are no longer trusted."""
+    __tablename__ = "token_revocations"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    revoked_at = Column(Float, nullable=False)
+
+class ReservationSlot(Base):
+    """
+    One hour of a court held by a reservation. The primary key makes the
+    database refuse a second reservation of the same court and hour.
+    """
+    __tablename__ = "reservation_slots"
+
+    court_id = Column(Integer, ForeignKey("courts.id"), primary_key=True)
+    slot_index = Column(Integer, primary_key=True)  # hours since 1970-01-01, see occupancy.slot_indexes
+    reservation_id = Column(Integer, ForeignKey("reservations.id"), nullable=False, index=True)
@@ -0,0 +1,177 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Lightweight copy of the reservation columns the availability endpoints return
+Booking = namedtuple(
+    "Booking",
+    ["start_date_time", "end_date_time", "id", "rate", "reservor_id", "court_id", "status"],
+)
+
+BOOKING_COLUMNS = tuple(getattr(models.Reservation, field) for field in Booking._fields)
+
+DEFAULT_SLOT = timedelta(hours=1)
+
+# Reservations hold every whole hour they touch in reservation_slots, numbered from SLOT_EPOCH
+SLOT_LENGTH = timedelta(hours=1)
+SLOT_EPOCH = datetime(1970, 1, 1)
+SLOTS_PER_DAY = timedelta(days=1) // SLOT_LENGTH
+
+
+def normalize(value: datetime) -> datetime:
+    """Reservations are stored as naive datetimes, so drop any timezone info."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=None)
+
+
+def slot_bounds(start: datetime, end: datetime):
+    """Widen [start, end) to the slot boundaries around it."""
+    start, end = normalize(start), normalize(end)
+    first = start - (start - SLOT_EPOCH) % SLOT_LENGTH
+    last = end - (end - SLOT_EPOCH) % SLOT_LENGTH
+    if last < end:
+        last += SLOT_LENGTH
+    return first, last
+
+
+def slot_indexes(start: datetime, end: datetime) -> range:
+    first, last = slot_bounds(start, end)
+    return range((first - SLOT_EPOCH) // SLOT_LENGTH, (last - SLOT_EPOCH) // SLOT_LENGTH)
+
+
+def slot_rows(reservation_id: int, court_id: int, start: datetime, end: datetime) -> List[dict]:
+    """reservation_slots rows for one reservation; reservations without a court hold none."""
+    if court_id is None:
+        return []
+    return [
+        {"court_id": court_id, "slot_index": slot_index, "reservation_id": reservation_id}
+        for slot_index in slot_indexes(start, end)
+    ]
+
+
+def booking_from_reservation(reservation: models.Reservation) -> Booking:
+    """Booking of a reservation, or of a row of BOOKING_COLUMNS."""
+    start = normalize(reservation.start_date_time)
+    end = normalize(reservation.end_date_time) if reservation.end_date_time else start + DEFAULT_SLOT
+    return Booking(
+        start_date_time=start,
+        end_date_time=end,
+        id=reservation.id,
+        rate=reservation.rate,
+        reservor_id=reservation.reservor_id,
+        court_id=reservation.court_id,
+        status=reservation.status,
+    )
+
+
+class CourtSchedule:
+    """Bookings of one court kept sorted by start time."""
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.bookings: List[Booking] = []
+        # Longest booking seen, bounds how far back an overlapping booking can start
+        self.max_duration = timedelta(0)
+
+    def add(self, booking: Booking):
+        index = bisect_right(self.starts, booking.start_date_time)
+        self.starts.insert(index, booking.start_date_time)
+        self.bookings.insert(index, booking)
+        self.max_duration = max(self.max_duration, booking.end_date_time - booking.start_date_time)
+
+    def remove(self, reservation_id: int, start: datetime) -> bool:
+        index = bisect_left(self.starts, start)
+        while index < len(self.bookings) and self.starts[index] == start:
+            if self.bookings[index].id == reservation_id:
+                del self.starts[index]
+                del self.bookings[index]
+                return True
+            index += 1
+        return False
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Booking]:
+        # Only bookings starting before `end` and no earlier than `start - max_duration`
+        # can overlap [start, end); for disjoint bookings that is at most one entry.
+        index = bisect_left(self.starts, end) - 1
+        lower = start - self.max_duration
+        conflicts = []
+        while index >= 0 and self.starts[index] >= lower:
+            booking = self.bookings[index]
+            if booking.end_date_time > start:
+                conflicts.append(booking)
+            index -= 1
+        conflicts.reverse()
+        return conflicts
+
+    def starting_between(self, start: datetime, end: datetime) -> List[Booking]:
+        return self.bookings[bisect_left(self.starts, start):bisect_left(self.starts, end)]
+
+
+class CourtOccupancy:
+    """
+    In-memory index of reservations per court used for conflict detection and
+    day listings. It is loaded from the reservations table once and then kept in
+    sync by the crud functions that create and delete reservations.
+
+    The index lives in the process, so it assumes a single API worker owns writes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.courts: Dict[int, CourtSchedule] = {}
+        self.loaded = False
+
+    async def load(self, db: AsyncSession, batch_size: int = 10000):
+        courts: Dict[int, CourtSchedule] = {}
+        # Only the Booking columns, streamed in batches instead of hydrating every ORM object
+        result = await db.stream(
+            select(*BOOKING_COLUMNS)
+            .order_by(models.Reservation.court_id, models.Reservation.start_date_time)
+            .execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            booking = booking_from_reservation(row)
+            courts.setdefault(booking.court_id, CourtSchedule()).add(booking)
+        with self.lock:
+            self.courts = courts
+            self.loaded = True
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if not self.loaded:
+            await self.load(db)
+
+    def add(self, reservation: models.Reservation):
+        booking = booking_from_reservation(reservation)
+        with self.lock:
+            self.courts.setdefault(booking.court_id, CourtSchedule()).add(booking)
+
+    def remove(self, reservation: models.Reservation):
+        with self.lock:
+            schedule = self.courts.get(reservation.court_id)
+            if schedule:
+                schedule.remove(reservation.id, normalize(reservation.start_date_time))
+
+    def conflicts(self, court_id: int, start: datetime, end: datetime) -> List[Booking]:
+        with self.lock:
+            schedule = self.courts.get(court_id)
+            return schedule.overlapping(normalize(start), normalize(end)) if schedule else []
+
+    def slot_conflicts(self, court_id: int, start: datetime, end: datetime) -> List[Booking]:
+        """Bookings holding any slot [start, end) touches, i.e. what reservation_slots would reject."""
+        return self.conflicts(court_id, *slot_bounds(start, end))
+
+    def bookings_between(self, court_id: int, start: datetime, end: datetime) -> List[Booking]:
+        with self.lock:
+            schedule = self.courts.get(court_id)
+            return schedule.starting_between(normalize(start), normalize(end)) if schedule else []
+
+
+court_occupancy = CourtOccupancy()
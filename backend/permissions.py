@@ -0,0 +1,78 @@
+import threading
+import zlib
+from typing import Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# One bit per permission, in declaration order, so new permissions must be appended
+PERMISSION_BITS = {permission: 1 << index for index, permission in enumerate(models.PermissionEnum)}
+
+# Written to an empty permissions table at startup, so a fresh database keeps the
+# access each role had before permissions were enforced
+DEFAULT_ROLE_PERMISSIONS = {
+    models.RoleEnum.MANAGER: list(models.PermissionEnum),
+    models.RoleEnum.EMPLOYEE: [models.PermissionEnum.MONETARY_DASHBOARD],
+}
+
+
+def permission_mask(permissions: Iterable[models.PermissionEnum]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+
+def permissions_from_mask(mask: int) -> List[models.PermissionEnum]:
+    return [permission for permission, bit in PERMISSION_BITS.items() if mask & bit]
+
+
+class RolePermissions:
+    """
+    The permissions table compiled into one bitmask per role. Loaded at startup
+    and reloaded by crud whenever the table is written, so permission checks
+    never query the database.
+
+    `fingerprint` identifies the table contents; tokens carry it next to their
+    mask so a mask issued before the table changed is not trusted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.masks: Dict[models.RoleEnum, int] = {}
+        self.fingerprint = self.compute_fingerprint({})
+
+    @staticmethod
+    def compute_fingerprint(masks: Dict[models.RoleEnum, int]) -> str:
+        contents = ",".join(f"{role.value}={masks.get(role, 0)}" for role in models.RoleEnum)
+        return format(zlib.crc32(contents.encode()), "08x")
+
+    async def load(self, db: AsyncSession):
+        masks = {role: 0 for role in models.RoleEnum}
+        result = await db.execute(select(models.Permission.role, models.Permission.permission))
+        for role, permission in result.tuples():
+            masks[role] |= PERMISSION_BITS[permission]
+        with self.lock:
+            self.masks = masks
+            self.fingerprint = self.compute_fingerprint(masks)
+
+    def mask(self, role: models.RoleEnum) -> int:
+        return self.masks.get(role, 0)
+
+    def permissions(self, role: models.RoleEnum) -> List[models.PermissionEnum]:
+        return permissions_from_mask(self.mask(role))
+
+    def claims(self, role: models.RoleEnum) -> dict:
+        """Compact token claims for `role`: the mask and the table fingerprint it came from."""
+        return {"perm": self.mask(role), "pfp": self.fingerprint}
+
+    def mask_from_claims(self, claims: dict, role: models.RoleEnum) -> int:
+        """The mask carried by a token, or the role's current mask if the token predates a change."""
+        if claims.get("pfp") == self.fingerprint and isinstance(claims.get("perm"), int):
+            return claims["perm"]
+        return self.mask(role)
+
+
+role_permissions = RolePermissions()
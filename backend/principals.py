@@ -0,0 +1,32 @@
+import os
+from collections import namedtuple
+
+from dotenv import load_dotenv
+
+from . import models
+from .cache import TTLCache
+
+load_dotenv()
+
+# Snapshot of the user columns request handlers read from current_user
+Principal = namedtuple(
+    "Principal",
+    ["id", "username", "email", "phonenumber", "avatar_url", "is_active", "role"],
+)
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def principal_from_user(user: models.User) -> Principal:
+    return Principal(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        phonenumber=user.phonenumber,
+        avatar_url=user.avatar_url,
+        is_active=user.is_active,
+        role=user.role,
+    )
@@ -0,0 +1,201 @@
+"""
+On-demand request profiling.
+
+A request carrying an `X-Profile: 1` header or a `_profile=1` query parameter
+from an authorized user runs under cProfile, and every SQL statement it issues
+is captured. The result is written to PROFILE_DIR as <id>.json (summary, top
+functions and SQL) and <id>.prof (raw pstats, for snakeviz or pstats), keeping
+only the newest PROFILE_KEEP profiles. The profile id is returned in the
+X-Profile-Id response header.
+
+cProfile traces the whole event loop thread, so requests served concurrently
+with a profiled one show up in its profile too. Only one request is profiled
+at a time; others asking meanwhile get `X-Profile: busy` and run normally.
+"""
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_MAX_STATEMENTS = 500
+
+PROFILE_ID = re.compile(r"^\d{8}T\d{6}-\d+$")
+
+current_statements: ContextVar[Optional[list]] = ContextVar("current_statements", default=None)
+
+
+def capture_sql(sync_engine):
+    """Record statements run on `sync_engine` while a profiled request is active."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if current_statements.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements = current_statements.get()
+        if statements is None or not conn.info.get("profile_started"):
+            return
+        elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+        if len(statements) < PROFILE_MAX_STATEMENTS:
+            statements.append({
+                "statement": statement,
+                "parameters": repr(parameters)[:500],
+                "executemany": executemany,
+                "ms": round(elapsed * 1000, 3),
+            })
+
+    @event.listens_for(sync_engine, "handle_error")
+    def discard_timer(context):
+        if context.connection is not None and context.connection.info.get("profile_started"):
+            context.connection.info["profile_started"].pop()
+
+
+class ProfileStore:
+    """Bounded ring buffer of profiles on disk, oldest removed first."""
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = directory
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+
+    def new_id(self) -> str:
+        return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{next(self.sequence)}"
+
+    def path(self, profile_id: str, suffix: str) -> Optional[str]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{suffix}")
+        return path if os.path.exists(path) else None
+
+    def ids(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json") and PROFILE_ID.match(name[:-5])]
+        return sorted(ids, key=lambda profile_id: (profile_id.split("-")[0], int(profile_id.split("-")[1])))
+
+    def save(self, profile_id: str, summary: dict, profiler: cProfile.Profile):
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+            with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as file:
+                json.dump(summary, file, indent=1, default=str)
+            for old_id in self.ids()[:-self.keep or None]:
+                for suffix in ("json", "prof"):
+                    try:
+                        os.remove(os.path.join(self.directory, f"{old_id}.{suffix}"))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> List[dict]:
+        """Summaries of the stored profiles, newest first, without the function and SQL detail."""
+        profiles = []
+        for profile_id in reversed(self.ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json")) as file:
+                    summary = json.load(file)
+            except (OSError, ValueError):
+                continue
+            summary.pop("functions", None)
+            summary.pop("statements", None)
+            profiles.append(summary)
+        return profiles
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+
+def top_functions(profiler: cProfile.Profile, limit: int = PROFILE_TOP_FUNCTIONS) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def profile_requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.strip() in (b"1", b"true")
+    if b"_profile" in scope["query_string"]:
+        return parse_qs(scope["query_string"].decode("latin-1")).get("_profile", [""])[0] in ("1", "true")
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests that ask for it. `authorize(scope)` decides whether the
+    caller may profile; unauthorized requests run normally.
+    """
+
+    def __init__(self, app, authorize, store: ProfileStore = profile_store):
+        self.app = app
+        self.authorize = authorize
+        self.store = store
+        self.busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope) or not await self.authorize(scope):
+            return await self.app(scope, receive, send)
+        if not self.busy.acquire(blocking=False):
+            return await self.app(scope, receive, with_headers(send, [(b"x-profile", b"busy")]))
+
+        profile_id = self.store.new_id()
+        status = 500
+        statements = []
+        token = current_statements.set(statements)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, with_headers(send_with_status, [(b"x-profile-id", profile_id.encode())]))
+            finally:
+                profiler.disable()
+        finally:
+            duration = time.perf_counter() - started
+            current_statements.reset(token)
+            self.busy.release()
+            route = scope.get("route")
+            self.store.save(profile_id, {
+                "id": profile_id,
+                "created_at": datetime.utcnow().isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path_format", None),
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "sql_count": len(statements),
+                "sql_ms": round(sum(statement["ms"] for statement in statements), 3),
+                "functions": top_functions(profiler),
+                "statements": statements,
+            }, profiler)
+
+
+def with_headers(send, headers):
+    async def send_with_headers(message):
+        if message["type"] == "http.response.start":
+            message = dict(message, headers=list(message.get("headers", [])) + headers)
+        await send(message)
+    return send_with_headers
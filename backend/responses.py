@@ -0,0 +1,200 @@
+"""
+Response encoding: the JSON serializer, Accept negotiation for MessagePack and
+compression of large bodies.
+
+Handlers return dicts and models through DEFAULT_RESPONSE_CLASS, which renders
+with orjson when it is installed. The big list endpoints skip that path and
+serialize read-model rows with their precompiled adapters (see rows_response in
+main); those also answer `Accept: application/msgpack` when msgpack is
+installed, with the same values JSON would carry (datetimes as ISO strings).
+
+CompressionMiddleware gzips, or brotli-compresses when brotli is installed,
+bodies of at least COMPRESSION_MIN_BYTES for clients that accept it. Streamed
+responses such as the ndjson export are compressed chunk by chunk; server-sent
+events are left alone so each event still reaches the client as it is sent.
+"""
+import os
+import zlib
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from starlette.datastructures import MutableHeaders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+# Quality 11 is meant for static assets; 4 compresses JSON better than gzip in less time
+BROTLI_QUALITY = 4
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+COMPRESSIBLE_TYPES = {JSON, MSGPACK, "application/x-ndjson", "application/javascript", "image/svg+xml"}
+UNCOMPRESSIBLE_TYPES = {"text/event-stream"}
+
+DEFAULT_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def accepted(header: Optional[str]) -> Dict[str, float]:
+    """Ranges of an Accept or Accept-Encoding header, lowercased, with their q values."""
+    ranges = {}
+    for part in (header or "").split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges[name] = quality
+    return ranges
+
+
+def media_type_quality(ranges: Dict[str, float], media_type: str) -> float:
+    if not ranges:
+        return 1.0  # no Accept header accepts anything
+    if media_type in ranges:
+        return ranges[media_type]
+    return ranges.get(media_type.split("/")[0] + "/*", ranges.get("*/*", 0.0))
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """MSGPACK when the client names it at least as highly as JSON, otherwise JSON."""
+    if msgpack is None:
+        return JSON
+    ranges = accepted(accept)
+    msgpack_quality = max((ranges.get(media_type, 0.0) for media_type in MSGPACK_TYPES), default=0.0)
+    if msgpack_quality > 0 and msgpack_quality >= media_type_quality(ranges, JSON):
+        return MSGPACK
+    return JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best content coding we can produce for the client, or None for identity."""
+    ranges = accepted(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        quality = ranges.get(encoding, ranges.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def encode(adapter: TypeAdapter, value, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(adapter.dump_python(value, mode="json"))
+    return adapter.dump_json(value)
+
+
+def compressor(encoding: str):
+    """(feed, finish) callables of a streaming compressor for `encoding`."""
+    if encoding == "br":
+        stream = brotli.Compressor(quality=BROTLI_QUALITY)
+        return stream.process, stream.finish
+    stream = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+    return stream.compress, stream.flush
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    feed, finish = compressor(encoding)
+    return feed(body) + finish()
+
+
+def compressible(status: int, headers: MutableHeaders) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in UNCOMPRESSIBLE_TYPES:
+        return False
+    return media_type in COMPRESSIBLE_TYPES or media_type.startswith("text/")
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing response bodies. Whole bodies under
+    `minimum_size` are sent as they are; a streamed body is compressed whatever
+    its size, since its length is not known up front.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), None
+        ))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        feed = finish = None
+
+        async def send_compressed(message):
+            nonlocal start, feed, finish
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows how big the response is
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                response_start, start = start, None
+                headers = MutableHeaders(raw=list(response_start.get("headers", [])))
+                if not compressible(response_start["status"], headers) or (not more_body and len(body) < self.minimum_size):
+                    await send(response_start)
+                    return await send(message)
+                headers.add_vary_header("Accept-Encoding")
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # The bytes differ from the identity representation
+                    headers["ETag"] = "W/" + etag
+                if not more_body:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(dict(response_start, headers=headers.raw))
+                    return await send(dict(message, body=body))
+                del headers["Content-Length"]
+                feed, finish = compressor(encoding)
+                await send(dict(response_start, headers=headers.raw))
+
+            if feed is None:
+                return await send(message)
+            chunk = feed(body) if more_body else feed(body) + finish()
+            if chunk or not more_body:
+                await send(dict(message, body=chunk))
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+load_dotenv()
+
+# AUTH_MODE=stateless trusts the user snapshot carried in short-lived access tokens
+STATELESS_AUTH = os.getenv("AUTH_MODE", "stateful") == "stateless"
+STATELESS_ACCESS_TOKEN_MINUTES = int(os.getenv("STATELESS_ACCESS_TOKEN_MINUTES", 15))
+
+
+class RevocationList:
+    """
+    Users whose access tokens must not be trusted any more, with the time they
+    were revoked. Stateless access tokens issued at or before that time are
+    refused (and refreshed against the database when a refresh token is
+    present), so a deactivation, deletion or profile change takes effect on the
+    next request instead of when the token expires.
+
+    An entry is only useful while tokens issued before it can still be valid,
+    so entries older than the access token lifetime are dropped. The set is
+    persisted to token_revocations and loaded at startup; each process keeps
+    its own copy, so with several workers a revocation only reaches the others
+    on their next start.
+    """
+
+    def __init__(self, retention: float):
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.revoked: Dict[int, float] = {}
+
+    async def load(self, db: AsyncSession):
+        cutoff = time.time() - self.retention
+        await db.execute(delete(models.TokenRevocation).where(models.TokenRevocation.revoked_at < cutoff))
+        await db.commit()
+        result = await db.execute(select(models.TokenRevocation.user_id, models.TokenRevocation.revoked_at))
+        with self.lock:
+            self.revoked = dict(result.tuples().all())
+
+    async def revoke(self, db: AsyncSession, user_id: int) -> float:
+        """Revoke the user's current tokens; the row is written in the caller's transaction."""
+        revoked_at = time.time()
+        await db.merge(models.TokenRevocation(user_id=user_id, revoked_at=revoked_at))
+        with self.lock:
+            self.revoked[user_id] = revoked_at
+            self.prune(revoked_at - self.retention)
+        return revoked_at
+
+    def prune(self, cutoff: float):
+        for user_id in [user_id for user_id, revoked_at in self.revoked.items() if revoked_at < cutoff]:
+            del self.revoked[user_id]
+
+    def is_revoked(self, user_id: int, issued_at: Optional[float]) -> bool:
+        revoked_at = self.revoked.get(user_id)
+        return revoked_at is not None and (issued_at is None or issued_at <= revoked_at)
+
+
+token_revocations = RevocationList(retention=STATELESS_ACCESS_TOKEN_MINUTES * 60)
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime, date, time
 from typing import List, Optional
+from typing_extensions import TypedDict
 from enum import Enum
+from . import models
 from .models import ReservationType  # Add this import
 
 class RoleEnum(str, Enum):
@@ -100,6 +102,14 @@ class Court(BaseModel):
     class Config:
         orm_mode = True
 
+class FreeWindow(BaseModel):
+    court_id: int
+    court_name: str
+    court_type: str
+    start_date_time: datetime
+    end_date_time: datetime
+    price: float
+
 class ReservationWithCourt(BaseModel):
     id: int
     start_date_time: datetime
@@ -123,6 +133,32 @@ class ReservationCreate(BaseModel):
     court_id: int
     # type: ReservationType = ReservationType.NORMAL_BOOKING
 
+class RecurrenceFrequency(str, Enum):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+class RecurringReservationCreate(BaseModel):
+    # First occurrence; later ones repeat at the same time of day
+    start_date_time: datetime
+    end_date_time: datetime
+    court_id: int
+    frequency: RecurrenceFrequency = RecurrenceFrequency.WEEKLY
+    until: date
+    skip_dates: List[date] = []
+
+class OccurrenceResult(BaseModel):
+    start_date_time: datetime
+    end_date_time: datetime
+    status: str  # "created", "conflict" or "skipped"
+    reservation_id: Optional[int] = None
+    conflicting_ids: List[int] = []
+
+class RecurringReservationResult(BaseModel):
+    created: int
+    conflicts: int
+    skipped: int
+    occurrences: List[OccurrenceResult]
+
 class Reservation(ReservationBase):
     id: int
     reservor_id: int
@@ -176,5 +212,80 @@ class TaskWithEmployee(BaseModel):
     class Config:
         from_attributes = True
 
+class CourtMonthOccupancy(BaseModel):
+    court_id: int
+    court_name: str
+    # One bitmap per day, bit h set when hour h is booked; base64 packs them 3 bytes a day, little endian
+    hours: List[int] | str
+
+class MonthOccupancy(BaseModel):
+    month: str
+    days: int
+    encoding: str  # "int" or "base64"
+    courts: List[CourtMonthOccupancy]
+
 class PermissionResponse(BaseModel):
     permissions: List[str]
+
+class PermissionUpdate(BaseModel):
+    permissions: List[models.PermissionEnum]
+
+
+# Read models for the list endpoints: crud selects only these columns and returns
+# plain dicts, which the precompiled adapters below serialize straight to JSON.
+
+class UserRow(TypedDict):
+    id: int
+    email: str
+    username: str
+    phonenumber: str
+    avatar_url: str
+    is_active: bool
+    role: models.RoleEnum
+
+class EmployeeRow(TypedDict):
+    id: int
+    username: str
+    email: str
+    phonenumber: str
+    is_active: bool
+    role: models.RoleEnum
+
+class CourtRow(TypedDict):
+    id: int
+    court_name: str
+    court_type: str
+    description: str
+    capacity: int
+    hourly_rate: float
+    is_available: bool
+    images: Optional[List[str]]
+
+class ReservationRow(TypedDict):
+    id: int
+    start_date_time: datetime
+    end_date_time: datetime
+    rate: int
+    status: str
+    court: CourtRow
+    reservor: UserRow
+
+class TaskUserRow(TypedDict):
+    username: Optional[str]
+    email: str
+
+class TaskRow(TypedDict):
+    id: int
+    title: str
+    description: Optional[str]
+    due_date: Optional[datetime]
+    status: Optional[models.TaskStatus]
+    assigned_to: Optional[int]
+    created_at: datetime
+    user: Optional[TaskUserRow]
+
+user_rows_adapter = TypeAdapter(List[UserRow])
+employee_rows_adapter = TypeAdapter(List[EmployeeRow])
+reservation_row_adapter = TypeAdapter(ReservationRow)
+reservation_rows_adapter = TypeAdapter(List[ReservationRow])
+task_rows_adapter = TypeAdapter(List[TaskRow])
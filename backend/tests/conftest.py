@@ -0,0 +1,112 @@
+"""
+Tests run against a scratch SQLite database. The engines are created when
+backend.database is imported, so DATABASE_URL is pointed at it first.
+
+    python -m pytest backend/tests
+"""
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="futsala-test-"), "test.db")
+
+import pytest  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from backend import models  # noqa: E402,F401  registers the tables
+from backend.database import Base, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def schema():
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client(anyio_backend, schema):
+    """In-process client for the app, with its startup and shutdown run around the session."""
+    import httpx
+
+    from backend import main
+    from backend.database import async_engine
+
+    try:
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
+    finally:
+        # Pooled aiosqlite connections keep non-daemon threads alive otherwise
+        await async_engine.dispose()
+
+
+def add_user(role: models.RoleEnum) -> int:
+    with engine.begin() as connection:
+        user_id = connection.execute(insert(models.User).values(
+            username=f"{role.value}-{uuid.uuid4().hex[:12]}", email=f"{uuid.uuid4().hex[:12]}@example.com",
+            phonenumber="9800000000", avatar_url="", hashed_password="", role=role, is_active=True,
+        )).inserted_primary_key[0]
+    return user_id
+
+
+def add_court() -> int:
+    with engine.begin() as connection:
+        return connection.execute(insert(models.Court).values(
+            court_name=f"Court {uuid.uuid4().hex[:6]}", court_type="futsal", description="",
+            capacity=10, hourly_rate=1000, is_available=True,
+        )).inserted_primary_key[0]
+
+
+def add_reservations(court_id: int, reservor_id: int, count: int, first: datetime) -> List[datetime]:
+    """`count` back-to-back one-hour reservations from `first`, inserted behind the app's back."""
+    starts = [first + timedelta(hours=hour) for hour in range(count)]
+    with engine.begin() as connection:
+        connection.execute(insert(models.Reservation), [
+            dict(start_date_time=start, end_date_time=start + timedelta(hours=1), rate=1000,
+                 court_id=court_id, reservor_id=reservor_id)
+            for start in starts
+        ])
+    return starts
+
+
+def log_in_as(client, role: models.RoleEnum) -> int:
+    from backend import main
+
+    user_id = add_user(role)
+    client.cookies.set("token", main.create_access_token({"sub": str(user_id)}, role=role))
+    return user_id
+
+
+@pytest.fixture
+def manager(client):
+    yield log_in_as(client, models.RoleEnum.MANAGER)
+    client.cookies.clear()
+
+
+@pytest.fixture
+def customer(client):
+    yield log_in_as(client, models.RoleEnum.CUSTOMER)
+    client.cookies.clear()
+
+
+@pytest.fixture
+def sql_statements():
+    """Every SQL statement the app's async engine runs during the test, in order."""
+    from backend.database import async_engine
+
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "after_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "after_cursor_execute", record)
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+
+from backend import models
+from backend.tests.conftest import add_court, add_reservations, add_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_all_reserves_without_paging_returns_every_reservation(client, manager):
+    court_id = add_court()
+    starts = add_reservations(court_id, add_user(models.RoleEnum.CUSTOMER), 150, datetime(2031, 3, 1))
+
+    response = await client.get("/api/all-reserves/", params={"court_id": court_id})
+    assert response.status_code == 200
+    assert [row["start_date_time"] for row in response.json()] == [start.isoformat() for start in starts]
+    assert "x-next-cursor" not in response.headers
+
+
+async def test_all_reserves_pages_with_limit_or_cursor(client, manager):
+    court_id = add_court()
+    add_reservations(court_id, add_user(models.RoleEnum.CUSTOMER), 150, datetime(2031, 4, 1))
+
+    first = await client.get("/api/all-reserves/", params={"court_id": court_id, "limit": 100})
+    assert len(first.json()) == 100
+    rest = await client.get("/api/all-reserves/", params={"court_id": court_id, "cursor": first.headers["x-next-cursor"]})
+    assert len(rest.json()) == 50
+    assert "x-next-cursor" not in rest.headers
@@ -0,0 +1,18 @@
+import pytest
+
+from backend.tests.conftest import add_court
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2033-01-01T08:00:00Z", "2033-01-01T12:00:00"),
+    ("2033-01-01T08:00:00", "2033-01-01T12:00:00+05:45"),
+])
+async def test_search_accepts_mixed_aware_and_naive_bounds(client, start, end):
+    add_court()
+    response = await client.get("/api/availability/search", params={"from": start, "to": end, "limit": 2000})
+    assert response.status_code == 200, response.text
+    assert {window["start_date_time"] for window in response.json()} == {
+        f"2033-01-01T{hour:02d}:00:00" for hour in range(8, 12)
+    }
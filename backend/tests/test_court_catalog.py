@@ -0,0 +1,22 @@
+import pytest
+
+from backend.court_catalog import court_catalog
+from backend.tests.conftest import add_court
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_catalog_sees_courts_added_by_another_process(client, customer, monkeypatch):
+    monkeypatch.setattr(court_catalog.responses, "ttl", 0)  # every body has expired by the next request
+    first = await client.get("/api/courts/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    # Rendered again, but nothing changed, so the client's copy is still current
+    assert (await client.get("/api/courts/", headers={"If-None-Match": etag})).status_code == 304
+
+    court_id = add_court()  # written behind the app's back, so no invalidation
+    response = await client.get("/api/courts/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert court_id in [court["id"] for court in response.json()]
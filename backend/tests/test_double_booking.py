@@ -0,0 +1,43 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from backend import models
+from backend.database import engine
+from backend.occupancy import slot_indexes
+from backend.tests.conftest import add_court, add_user
+
+pytestmark = pytest.mark.anyio
+
+CUSTOMERS = 300
+
+
+async def test_simultaneous_bookings_of_one_slot_accept_exactly_one(client):
+    from backend import main
+
+    court_id = add_court()
+    # Half past, so the booking holds two slots
+    start = datetime(2033, 3, 1, 18, 30)
+    end = start + timedelta(hours=1)
+    tokens = [
+        main.create_access_token({"sub": str(add_user(models.RoleEnum.CUSTOMER))}, role=models.RoleEnum.CUSTOMER)
+        for _ in range(CUSTOMERS)
+    ]
+    body = {"court_id": court_id, "start_date_time": start.isoformat(), "end_date_time": end.isoformat()}
+
+    async def book(token):
+        return await client.post("/api/create_reservation/", json=body, headers={"Cookie": f"token={token}"})
+
+    responses = await asyncio.gather(*(book(token) for token in tokens))
+    assert Counter(response.status_code for response in responses) == {200: 1, 409: CUSTOMERS - 1}
+    reservation_id = next(response.json()["id"] for response in responses if response.status_code == 200)
+
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(models.ReservationSlot.slot_index, models.ReservationSlot.reservation_id)
+            .filter(models.ReservationSlot.court_id == court_id)
+        ).all()
+    assert sorted(rows) == [(slot_index, reservation_id) for slot_index in slot_indexes(start, end)]
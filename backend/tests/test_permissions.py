@@ -0,0 +1,34 @@
+import pytest
+
+from backend import models
+from backend.permissions import PERMISSION_BITS, role_permissions
+from backend.tests.conftest import add_user
+
+pytestmark = pytest.mark.anyio
+
+
+def test_empty_permissions_table_is_seeded_with_the_defaults(client):
+    assert models.PermissionEnum.MONETARY_DASHBOARD in role_permissions.permissions(models.RoleEnum.MANAGER)
+    assert role_permissions.permissions(models.RoleEnum.CUSTOMER) == []
+
+
+@pytest.mark.parametrize("path", ["/api/dashboard", "/api/reservation_trends"])
+async def test_token_without_the_permission_bit_is_refused_without_a_query(client, sql_statements, path):
+    from backend import main
+
+    user_id = add_user(models.RoleEnum.MANAGER)
+    mask = role_permissions.mask(models.RoleEnum.MANAGER) & ~PERMISSION_BITS[models.PermissionEnum.MONETARY_DASHBOARD]
+    client.cookies.set("token", main.create_access_token(
+        {"sub": str(user_id), "perm": mask, "pfp": role_permissions.fingerprint}
+    ))
+    try:
+        response = await client.get(path)
+    finally:
+        client.cookies.clear()
+    assert response.status_code == 403
+    assert not [statement for statement in sql_statements if "permissions" in statement]
+
+
+async def test_manager_token_with_the_permission_bit_sees_the_dashboard(client, manager, sql_statements):
+    assert (await client.get("/api/reservation_trends")).status_code == 200
+    assert not [statement for statement in sql_statements if "permissions" in statement]
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from backend import crud, schemas
+from backend.database import AsyncSessionLocal
+from backend.principals import principal_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_deactivated_user_is_refused_on_the_next_request(client, customer):
+    assert (await client.get("/api/current_user/")).status_code == 200  # cached
+    async with AsyncSessionLocal() as db:
+        await crud.update_user(db, customer, schemas.UserUpdate(is_active=False))
+    assert (await client.get("/api/current_user/")).status_code == 401
+
+
+async def test_load_racing_a_deactivation_does_not_cache_the_stale_user(client, customer, monkeypatch):
+    principal_cache.invalidate(customer)
+    loaded, release = asyncio.Event(), asyncio.Event()
+    get_user = crud.get_user
+
+    async def slow_first_get_user(db, user_id):
+        user = await get_user(db, user_id)
+        if not loaded.is_set():
+            loaded.set()
+            await release.wait()
+        return user
+
+    monkeypatch.setattr(crud, "get_user", slow_first_get_user)
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await crud.get_principal(db, customer)
+
+    stale = asyncio.ensure_future(load())
+    await loaded.wait()  # the row is read while the user is still active
+    async with AsyncSessionLocal() as db:
+        await crud.update_user(db, customer, schemas.UserUpdate(is_active=False))
+    release.set()
+    assert (await stale).is_active
+
+    assert principal_cache.get(customer) is None
+    assert (await client.get("/api/current_user/")).status_code == 401
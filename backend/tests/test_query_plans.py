@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from backend import crud
+
+
+def query_plan(connection, query) -> str:
+    compiled = query.compile(dialect=connection.dialect)
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_court_day_lookup_searches_court_start_index(schema):
+    day_start, day_end = crud.day_bounds(datetime(2030, 1, 1, 18, 30))
+    with schema.connect() as connection:
+        plan = query_plan(connection, crud.court_reserves_query(1, day_start, day_end))
+    assert "SEARCH" in plan and "ix_reservations_court_start" in plan, plan
+    assert "start_date_time>? AND start_date_time<?" in plan, plan
+
+
+def test_court_hour_lookup_searches_court_start_index(schema):
+    hour_start = datetime(2030, 1, 1, 18)
+    with schema.connect() as connection:
+        plan = query_plan(connection, crud.court_reserves_query(1, hour_start, hour_start + timedelta(hours=1)))
+    assert "SEARCH" in plan and "ix_reservations_court_start" in plan, plan
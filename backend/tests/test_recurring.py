@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from backend.tests.conftest import add_court
+
+pytestmark = pytest.mark.anyio
+
+
+def weekly(court_id: int, start: str, end: str, until: str) -> dict:
+    return {"court_id": court_id, "start_date_time": start, "end_date_time": end, "frequency": "weekly", "until": until}
+
+
+async def test_recurring_books_each_occurrence(client, customer):
+    response = await client.post("/api/create_reservation/recurring", json=weekly(
+        add_court(), "2032-01-05T18:00:00", "2032-01-05T19:00:00", "2032-01-26"
+    ))
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 4
+
+
+@pytest.mark.parametrize("until", ["9000-12-31", "9999-12-31"])
+async def test_recurring_rejects_far_until_without_expanding_it(client, customer, until):
+    started = time.perf_counter()
+    response = await client.post("/api/create_reservation/recurring", json=weekly(
+        add_court(), "2032-01-05T18:00:00", "2032-01-05T19:00:00", until
+    ))
+    assert response.status_code == 400
+    assert "At most" in response.json()["detail"]
+    assert time.perf_counter() - started < 0.5
+
+
+async def test_recurring_rejects_occurrences_past_the_datetime_range(client, customer):
+    response = await client.post("/api/create_reservation/recurring", json=weekly(
+        add_court(), "9999-12-31T22:30:00", "9999-12-31T23:30:00", "9999-12-31"
+    ))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Reservation dates are out of range"
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2032-02-02T18:00:00+05:45", "2032-02-02T19:00:00"),
+    ("2032-02-02T18:00:00", "2032-02-02T19:00:00Z"),
+])
+async def test_recurring_accepts_mixed_aware_and_naive_bounds(client, customer, start, end):
+    rule = weekly(add_court(), start, end, "2032-02-23")
+    rule["skip_dates"] = ["2032-02-09"]
+    response = await client.post("/api/create_reservation/recurring", json=rule)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["skipped"]) == (3, 1)
+    assert body["occurrences"][0]["start_date_time"] == start[:19]
+
+
+async def test_recurring_rejects_mixed_bounds_in_the_wrong_order(client, customer):
+    response = await client.post("/api/create_reservation/recurring", json=weekly(
+        add_court(), "2032-02-02T19:00:00Z", "2032-02-02T18:00:00", "2032-02-23"
+    ))
+    assert response.status_code == 400
@@ -0,0 +1,22 @@
+import pytest
+
+from backend.tests.conftest import add_court
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2030-01-02T18:00:00Z", "2030-01-02T19:00:00"),
+    ("2030-01-03T18:00:00", "2030-01-03T19:00:00+05:45"),
+])
+async def test_create_reservation_accepts_mixed_aware_and_naive_bounds(client, customer, start, end):
+    response = await client.post("/api/create_reservation/", json={"court_id": add_court(), "start_date_time": start, "end_date_time": end})
+    assert response.status_code == 200, response.text
+    assert response.json()["start_date_time"] == start[:19]
+
+
+async def test_create_reservation_rejects_mixed_bounds_in_the_wrong_order(client, customer):
+    response = await client.post("/api/create_reservation/", json={
+        "court_id": add_court(), "start_date_time": "2030-01-04T19:00:00Z", "end_date_time": "2030-01-04T18:00:00",
+    })
+    assert response.status_code == 400
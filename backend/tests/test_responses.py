@@ -0,0 +1,45 @@
+import gzip
+
+import pytest
+
+from backend import models
+from backend.tests.conftest import add_user
+
+pytestmark = pytest.mark.anyio
+
+msgpack = pytest.importorskip("msgpack")
+brotli = pytest.importorskip("brotli")
+
+
+async def test_users_negotiate_msgpack(client, manager):
+    for _ in range(3):
+        add_user(models.RoleEnum.CUSTOMER)
+    as_json = await client.get("/api/users/")
+    as_msgpack = await client.get("/api/users/", headers={"Accept": "application/msgpack, application/json;q=0.5"})
+    assert as_msgpack.headers["content-type"] == "application/msgpack"
+    assert "Accept" in as_msgpack.headers["vary"]
+    assert msgpack.unpackb(as_msgpack.content) == as_json.json()
+
+
+async def test_users_prefer_json_for_browsers(client, manager):
+    response = await client.get("/api/users/", headers={"Accept": "text/html,*/*;q=0.8"})
+    assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+async def test_large_bodies_are_compressed(client, manager, encoding, decompress):
+    for _ in range(30):
+        add_user(models.RoleEnum.CUSTOMER)
+    plain = await client.get("/api/users/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    # Read the raw stream so httpx does not decode it for us
+    async with client.stream("GET", "/api/users/", headers={"Accept-Encoding": encoding}) as response:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) == len(body) < len(plain.content)
+    assert decompress(body) == plain.content
+
+
+async def test_small_bodies_are_not_compressed(client, customer):
+    response = await client.get("/api/current_user/", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,56 @@
+"""
+Statements per request for the endpoints that serialize reservations with
+their court and reservor. Each count is checked before and after more rows
+(on more courts) are added, so a lazy load per row fails the test.
+"""
+from datetime import datetime
+
+import pytest
+
+from backend.tests.conftest import add_court, add_reservations
+
+pytestmark = pytest.mark.anyio
+
+
+async def statements_for(client, sql_statements, path: str, **params) -> int:
+    await client.get(path, params=params)  # warm the principal cache
+    sql_statements.clear()
+    response = await client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    return len(sql_statements)
+
+
+def add_bookings(reservor_id: int, count: int):
+    for first in (datetime(2001, 1, 1), datetime(2041, 1, 1)):  # past and upcoming
+        add_reservations(add_court(), reservor_id, count, first)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/api/current_reserves/", 1),
+    ("/api/past_reserves/", 1),
+    ("/api/reserves_current_user/", 1),
+])
+async def test_customer_reservation_lists_run_a_fixed_number_of_statements(client, customer, sql_statements, path, expected):
+    add_bookings(customer, 2)
+    assert await statements_for(client, sql_statements, path) == expected
+    add_bookings(customer, 20)
+    assert await statements_for(client, sql_statements, path) == expected
+
+
+@pytest.mark.parametrize("path, params, expected", [
+    ("/api/users/{customer}/current_reserves/", {}, 1),
+    ("/api/users/{customer}/past_reserves/", {}, 1),
+    ("/api/all-reserves/", {}, 1),
+    ("/api/all-reserves/", {"limit": 50}, 1),
+    ("/api/dashboard", {}, 2),
+])
+async def test_manager_reservation_lists_run_a_fixed_number_of_statements(client, manager, sql_statements, path, params, expected):
+    from backend import models
+    from backend.tests.conftest import add_user
+
+    customer = add_user(models.RoleEnum.CUSTOMER)
+    path = path.format(customer=customer)
+    add_bookings(customer, 2)
+    assert await statements_for(client, sql_statements, path, **params) == expected
+    add_bookings(customer, 20)
+    assert await statements_for(client, sql_statements, path, **params) == expected
@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_trends_accept_aware_start_without_end(client, manager):
+    start = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    response = await client.get("/api/reservation_trends", params={"start": start, "granularity": "day"})
+    assert response.status_code == 200, response.text
+    assert isinstance(response.json(), list)
+
+
+async def test_trends_accept_mixed_aware_and_naive_bounds(client, manager):
+    response = await client.get("/api/reservation_trends", params={"start": "2030-01-01T00:00:00Z", "end": "2030-02-01T00:00:00"})
+    assert response.status_code == 200, response.text
+
+
+async def test_trends_reject_start_after_end(client, manager):
+    response = await client.get("/api/reservation_trends", params={"start": "2030-02-01T00:00:00+05:45", "end": "2030-01-01T00:00:00"})
+    assert response.status_code == 400